@@ -4,11 +4,16 @@ CRM Query Tools — entry point.
 Handles shared sidebar (AWS credentials) and page navigation.
 """
 
+import hashlib
 import json
 from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
 
 import boto3
 import streamlit as st
+from botocore.config import Config
+
+from http_timeouts import REQUEST_TIMEOUT
 
 st.set_page_config(
     page_title="CRM Query Tools",
@@ -16,12 +21,87 @@ st.set_page_config(
     layout="wide",
 )
 
+# Credentials this close to expiry are dropped rather than used, so a query
+# never starts on a session that lapses halfway through.
+EXPIRY_MARGIN_SECS = 300
+
+# Cached boto3 sessions and their Secrets Manager clients are dropped after the
+# longest STS credential lifetime (12h); each re-paste of refreshed credentials
+# adds an entry, so the total is capped too.
+AWS_SESSION_TTL_SECS = 12 * 3600
+AWS_SESSION_MAX_ENTRIES = 32
+
+# Secrets Manager client settings: a larger keep-alive pool and adaptive retries,
+# with the same timeouts as every other outbound call.
+AWS_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={"max_attempts": 5, "mode": "adaptive"},
+    connect_timeout=REQUEST_TIMEOUT[0],
+    read_timeout=REQUEST_TIMEOUT[1],
+)
+
+
+@st.cache_resource(show_spinner=False, ttl=AWS_SESSION_TTL_SECS, max_entries=AWS_SESSION_MAX_ENTRIES)
+def _make_session(access_key: str, _secret_key: str, token: str, region: str) -> boto3.Session:
+    """Build one boto3 Session per credential set and reuse it across reruns."""
+    return boto3.Session(
+        aws_access_key_id=access_key,
+        aws_secret_access_key=_secret_key,
+        aws_session_token=token,
+        region_name=region,
+    )
+
+
+@st.cache_resource(show_spinner=False, ttl=AWS_SESSION_TTL_SECS, max_entries=AWS_SESSION_MAX_ENTRIES)
+def _make_secrets_client(_session: boto3.Session, fingerprint: str):
+    """One Secrets Manager client per credential set; pages only ever see this client.
+
+    Keyed by the credentials fingerprint (key id, session token and region): refreshed
+    STS credentials keep their AccessKeyId but must not reuse the old token's client.
+    """
+    return _session.client("secretsmanager", config=AWS_CLIENT_CONFIG)
+
+
+def _parse_creds(blob: str) -> Tuple[Dict, Optional[datetime]]:
+    """Parse the pasted credentials JSON and its Expiration timestamp.
+
+    Deliberately not cached: st.cache_data would keep every pasted secret key
+    in a server-wide cache shared by all sessions.
+    """
+    raw = json.loads(blob)
+    expiry_dt = None
+    if expiry := raw.get("Expiration"):
+        try:
+            expiry_dt = _parse_aws_expiry(expiry)
+        except Exception:
+            pass
+    return raw, expiry_dt
+
+
+def _parse_aws_expiry(s: str) -> datetime:
+    """Parse the fixed UTC format AWS emits (YYYY-MM-DDTHH:MM:SSZ or +00:00) by slicing.
+
+    Anything else goes through the general ISO parser.
+    """
+    if s[19:] in ("Z", "+00:00") and s[4] == "-" and s[10] == "T":
+        return datetime(
+            int(s[0:4]), int(s[5:7]), int(s[8:10]),
+            int(s[11:13]), int(s[14:16]), int(s[17:19]),
+            tzinfo=timezone.utc,
+        )
+    return datetime.fromisoformat(s.replace("Z", "+00:00"))
+
+
+def _clear_aws_session():
+    st.session_state.pop("secrets_client", None)
+    st.session_state.pop("aws_identity", None)
+    st.session_state.pop("aws_creds_fingerprint", None)
+
+
 # ── Sidebar: AWS credentials (shown on every page) ────────────────────────────
 
-with st.sidebar:
-    st.title("🔑 AWS Credentials")
-    st.markdown(
-        """
+_SIDEBAR_DOC = """
 Run these two commands in your terminal, then paste the output below:
 
 ```bash
@@ -30,39 +110,49 @@ aws sso login --profile hook-production-tic
 ```bash
 aws configure export-credentials --profile hook-production-tic
 ```
-        """
-    )
+"""
+
+_CREDS_PLACEHOLDER = '{\n  "AccessKeyId": "ASIA...",\n  "SecretAccessKey": "...",\n  "SessionToken": "...",\n  "Expiration": "..."\n}'
+
+with st.sidebar:
+    st.title("🔑 AWS Credentials")
+    st.markdown(_SIDEBAR_DOC)
     creds_json = st.text_area(
         "Paste credentials JSON",
         height=200,
-        placeholder='{\n  "AccessKeyId": "ASIA...",\n  "SecretAccessKey": "...",\n  "SessionToken": "...",\n  "Expiration": "..."\n}',
+        placeholder=_CREDS_PLACEHOLDER,
     )
     region = st.text_input("AWS Region", value="eu-west-1")
 
     if creds_json.strip():
         try:
-            raw = json.loads(creds_json)
+            raw, expiry_dt = _parse_creds(creds_json)
+            expiry = raw.get("Expiration")
             expired = False
-            if expiry := raw.get("Expiration"):
-                try:
-                    expiry_dt = datetime.fromisoformat(expiry.replace("Z", "+00:00"))
-                    remaining = expiry_dt - datetime.now(timezone.utc)
-                    total_secs = int(remaining.total_seconds())
-                    if total_secs <= 0:
-                        expired = True
-                except Exception:
-                    pass
+            if expiry_dt:
+                remaining = expiry_dt - datetime.now(timezone.utc)
+                total_secs = int(remaining.total_seconds())
+                if total_secs <= EXPIRY_MARGIN_SECS:
+                    expired = True
 
             if expired:
-                st.session_state.pop("aws_session", None)
-                st.error("⛔ Credentials have expired — please re-auth and enter fresh credentials")
+                _clear_aws_session()
+                if total_secs <= 0:
+                    st.error("⛔ Credentials have expired — please re-auth and enter fresh credentials")
+                else:
+                    st.error("⛔ Credentials expire in under 5 minutes — please re-auth and enter fresh credentials")
             else:
-                st.session_state["aws_session"] = boto3.Session(
-                    aws_access_key_id=raw["AccessKeyId"],
-                    aws_secret_access_key=raw["SecretAccessKey"],
-                    aws_session_token=raw.get("SessionToken"),
-                    region_name=region,
-                )
+                # Only swap the session when the pasted credentials actually change.
+                fingerprint = hashlib.blake2b(
+                    f"{raw['AccessKeyId']}|{raw.get('SessionToken')}|{region}".encode(), digest_size=16,
+                ).hexdigest()
+                if st.session_state.get("aws_creds_fingerprint") != fingerprint:
+                    aws_session = _make_session(
+                        raw["AccessKeyId"], raw["SecretAccessKey"], raw.get("SessionToken"), region,
+                    )
+                    st.session_state["secrets_client"] = _make_secrets_client(aws_session, fingerprint)
+                    st.session_state["aws_identity"] = (raw["AccessKeyId"], region, fingerprint)
+                    st.session_state["aws_creds_fingerprint"] = fingerprint
                 st.success("✓ Credentials loaded")
                 if expiry:
                     try:
@@ -79,7 +169,7 @@ aws configure export-credentials --profile hook-production-tic
                     except Exception:
                         st.caption(f"Expires: {expiry}")
         except Exception as exc:
-            st.session_state.pop("aws_session", None)
+            _clear_aws_session()
             st.error(f"Invalid JSON: {exc}")
 
 # ── Navigation ────────────────────────────────────────────────────────────────
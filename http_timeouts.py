@@ -0,0 +1,7 @@
+"""
+Timeouts shared by the Streamlit app's outbound calls (AWS, HubSpot, Salesforce).
+"""
+
+# (connect, read) timeouts in seconds: an unreachable host fails fast, while a
+# slow query still gets the full 10s.
+REQUEST_TIMEOUT = (3.05, 10)
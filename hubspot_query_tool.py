@@ -6,17 +6,35 @@ Fetches credentials from AWS Secrets Manager and queries HubSpot CRM objects
 USAGE: Edit the CONFIG section below and run: python hubspot_query_tool.py
 """
 
-import json
 import boto3
+import hashlib
+import json
 import requests
 import os
-from typing import Dict, Any, List, Optional
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
 from datetime import datetime
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
+
+# orjson encodes/decodes large search payloads several times faster; fall back
+# to the stdlib when it isn't installed. json_dumps always returns bytes.
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
 
 # ============================================================================
 # CONFIGURATION - EDIT THIS SECTION
@@ -58,6 +76,10 @@ CONFIG = {
     'search_objects_mode': True,
     'search_objects_filter': 'com',  # Filter by name/label, or None to list all
 
+    # Most count requests discover mode starts per minute, across all worker threads.
+    # Counts go through the search API, which allows 5 requests a second per portal.
+    'discover_rate_per_minute': 240,
+
     # Search filters (only used if query_type is 'search')
     # All filters in this list are ANDed together
     # Operators: EQ, NEQ, LT, LTE, GT, GTE, HAS_PROPERTY, NOT_HAS_PROPERTY,
@@ -72,11 +94,26 @@ CONFIG = {
     # Example: ['firstname', 'lastname', 'email', 'lifecyclestage']
     'properties': [],
 
-    # Always refresh the access token via OAuth before running.
+    # Specific record IDs to export for 'all' (fetched via the batch read API,
+    # 100 IDs per request). Leave empty [] to page through records up to query_limit.
+    'record_ids': [],
+
+    # For 'all' with no 'properties' set: skip calculated properties, which are
+    # the most expensive for HubSpot to compute and bulk up every page.
+    'exclude_calculated_properties': False,
+
+    # Use the OAuth refresh flow before running.
     # Recommended: True — HubSpot tokens expire after 30 minutes.
+    # Refreshed tokens are cached under ~/.cache/hubspot_query_tool and reused
+    # until a minute before they expire; a 401 mid-run triggers one refresh.
     # Set to False only if your secret contains a long-lived private app token.
     'always_refresh_token': True,
 
+    # Seconds to reuse property lists and custom schemas cached on disk under
+    # ~/.cache/hubspot_query_tool (per secret path). Set to 0 to always refetch,
+    # e.g. right after adding properties in HubSpot.
+    'metadata_cache_ttl': 3600,
+
    
 }
 
@@ -90,26 +127,156 @@ STANDARD_OBJECTS = [
     'emails', 'meetings', 'notes', 'tasks', 'communications',
 ]
 
+# Discover rows for the standard objects, with name + label pre-lowered for filtering
+STANDARD_OBJECT_ROWS = tuple(
+    {'name': o, 'label': o.title(), 'type': 'standard', 'search_text': f"{o}\n{o.title()}".lower()}
+    for o in STANDARD_OBJECTS
+)
+
 BASE_URL = 'https://api.hubapi.com'
+OBJECTS_URL = f'{BASE_URL}/crm/v3/objects'
+OAUTH_TOKEN_URL = f'{BASE_URL}/oauth/v1/token'
+
+# On-disk cache: refreshed OAuth access tokens (one file per client_id) and
+# property/schema metadata (one file per secret path + object)
+CACHE_DIR = os.path.expanduser('~/.cache/hubspot_query_tool')
+# Treat cached tokens as expired this many seconds early
+TOKEN_EXPIRY_MARGIN = 60
+# Default lifetime of cached property lists and custom schemas (seconds)
+METADATA_CACHE_TTL = 3600
+
+# Property metadata → shape export row (Property Name, Label, Type, Field Type, Group)
+PROPERTY_ROW = itemgetter('name', 'label', 'type', 'fieldType', 'groupName')
+
+# Concurrent page requests when paginating search results. HubSpot limits
+# search to a few requests per second; 429s are retried by the adapter below.
+PAGE_WORKERS = 4
+
+# Streamed exports size their columns from this many leading records, since
+# write-only sheets need widths before the first row is written.
+WIDTH_SAMPLE_ROWS = 100
+
+# Concurrent COUNT requests in search-objects mode; their starts are paced by
+# CONFIG['discover_rate_per_minute'] (same search rate limit).
+COUNT_WORKERS = 8
+
+# Error response bodies are cut to this many bytes before printing.
+ERROR_BODY_LIMIT = 512
 
 console = Console()
 
 
+def _cache_path(key: str, prefix: str = '') -> str:
+    """Cache file for `key`, hashed so secrets and paths never appear in filenames"""
+    return os.path.join(CACHE_DIR, f'{prefix}{hashlib.sha1(str(key).encode()).hexdigest()}.json')
+
+
+def _token_cache_key(credentials: Dict[str, Any]) -> str:
+    """Token cache key for one portal's OAuth credentials.
+
+    A public app shares its client_id across every portal it is installed in,
+    so the refresh token (one per installation) is part of the key.
+    """
+    return f"token:{credentials['client_id']}:{credentials['refresh_token']}"
+
+
+def _read_cache(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'rb') as f:
+            return json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path: str, obj: Dict):
+    """Write a cache file atomically (owner-only); caching is best-effort"""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json_dumps(obj))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _new_http_session() -> requests.Session:
+    """HTTP session that keeps the TLS connection to HubSpot alive across
+    paginated calls and retries transient 429/5xx responses with backoff."""
+    http = requests.Session()
+    http.mount('https://', HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=50,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET', 'POST'],
+            raise_on_status=False,
+        ),
+    ))
+    http.headers['Content-Type'] = 'application/json'
+    return http
+
+
+class RateLimiter:
+    """Spaces calls evenly at `per_minute` starts per minute across threads.
+
+    Each caller reserves the next start slot under the lock and sleeps
+    outside it, so time already spent on a request counts towards the gap.
+    A `per_minute` of 0 or None means no limit.
+    """
+
+    def __init__(self, per_minute: Optional[int]):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_ok = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_ok)
+            self.next_ok = start + self.interval
+        time.sleep(start - now)
+
+
+@lru_cache(maxsize=None)
+def _header_styles():
+    """HubSpot orange header fill + font, built once on first export."""
+    from openpyxl.styles import Font, PatternFill
+    return (
+        PatternFill(start_color="FF7A00", end_color="FF7A00", fill_type="solid"),
+        Font(bold=True, color="FFFFFF"),
+    )
+
+
 class HubSpotQueryTool:
-    def __init__(self, profile: str, region: str):
+    def __init__(self, profile: str, region: str, metadata_cache_ttl: int = METADATA_CACHE_TTL):
         self.profile = profile
         self.region = region
         self.session = boto3.Session(profile_name=profile, region_name=region)
         self.secrets_client = self.session.client('secretsmanager')
+        self.http = _new_http_session()
         self.token = None
         self.auth_type = None  # 'bearer' or 'hapikey'
+        self.oauth_credentials = None  # set when the token can be refreshed on 401
+        self._refresh_lock = threading.Lock()
+        self.secret_path = None  # scopes the on-disk metadata cache
+        self.metadata_cache_ttl = metadata_cache_ttl
+        self._limit0_ok = True  # cleared once search rejects a limit-0 count
+
+    def close(self):
+        """Release the pooled HubSpot connections"""
+        self.http.close()
 
     def get_secret(self, secret_name: str) -> Dict[str, Any]:
         """Fetch secret from AWS Secrets Manager"""
         try:
             console.print(f"[cyan]Fetching secret: {secret_name}[/cyan]")
             response = self.secrets_client.get_secret_value(SecretId=secret_name)
-            return json.loads(response['SecretString'])
+            self.secret_path = secret_name
+            return json_loads(response['SecretString'])
         except Exception as e:
             console.print(f"[red]Error fetching secret: {str(e)}[/red]")
             raise
@@ -119,22 +286,32 @@ class HubSpotQueryTool:
 
         Auth priority:
         1. hapikey  → legacy API key, passed as ?hapikey= query param
-        2. OAuth refresh (if refresh_token + client_id + client_secret present and always_refresh=True)
+        2. OAuth (if refresh_token + client_id + client_secret present and always_refresh=True):
+           a still-valid cached token, otherwise a refresh
         3. Stored access_token / token / api_key as Bearer
         """
         # Legacy API key — different auth mechanism, can't use Bearer
         if credentials.get('hapikey'):
             self.token = credentials['hapikey']
             self.auth_type = 'hapikey'
+            self._apply_auth()
             console.print("[cyan]Auth: legacy API key (hapikey)[/cyan]")
             return
 
         # OAuth refresh — recommended when token expires in 30 min
         has_oauth = all(k in credentials for k in ('client_id', 'client_secret', 'refresh_token'))
         if always_refresh and has_oauth:
+            self.oauth_credentials = credentials
+            self.auth_type = 'bearer'
+            cached = self._load_cached_token(_token_cache_key(credentials))
+            if cached:
+                self.token = cached
+                self._apply_auth()
+                console.print("[cyan]Auth: cached OAuth access token[/cyan]")
+                return
             console.print("[cyan]Refreshing OAuth access token...[/cyan]")
             self.token = self._refresh_oauth_token(credentials)
-            self.auth_type = 'bearer'
+            self._apply_auth()
             console.print("[green]✓ Fresh access token obtained[/green]")
             return
 
@@ -143,6 +320,7 @@ class HubSpotQueryTool:
             if credentials.get(key):
                 self.token = credentials[key]
                 self.auth_type = 'bearer'
+                self._apply_auth()
                 console.print(f"[cyan]Auth: stored Bearer token (key '{key}')[/cyan]")
                 return
 
@@ -155,7 +333,7 @@ class HubSpotQueryTool:
 
     def _refresh_oauth_token(self, credentials: Dict[str, Any]) -> str:
         """Get a fresh HubSpot access token using the refresh_token grant"""
-        url = "https://api.hubapi.com/oauth/v1/token"
+        url = OAUTH_TOKEN_URL
         data = {
             'grant_type': 'refresh_token',
             'client_id': credentials['client_id'],
@@ -163,243 +341,322 @@ class HubSpotQueryTool:
             'refresh_token': credentials['refresh_token'],
         }
         try:
-            response = requests.post(
+            response = self.http.post(
                 url, data=data,
                 headers={'Content-Type': 'application/x-www-form-urlencoded'}
             )
             response.raise_for_status()
-            return response.json()['access_token']
+            data = json_loads(response.content)
         except Exception as e:
-            console.print(f"[red]OAuth token refresh failed: {str(e)}[/red]")
-            if hasattr(e, 'response') and e.response is not None:
-                console.print(f"[red]Response: {e.response.text}[/red]")
+            self._print_error(e, "OAuth token refresh failed")
             raise
+        self._save_cached_token(_token_cache_key(credentials), data['access_token'], data.get('expires_in', 0))
+        return data['access_token']
 
-    def _get(self, url: str, extra_params: Dict = None) -> requests.Response:
-        """Authenticated GET request"""
-        headers = {'Content-Type': 'application/json'}
-        params = {}
-        if self.auth_type == 'bearer':
-            headers['Authorization'] = f'Bearer {self.token}'
-        else:  # hapikey
-            params['hapikey'] = self.token
-        if extra_params:
-            params.update(extra_params)
-        return requests.get(url, headers=headers, params=params)
-
-    def _post(self, url: str, payload: Dict, extra_params: Dict = None) -> requests.Response:
-        """Authenticated POST request"""
-        headers = {'Content-Type': 'application/json'}
-        params = {}
+    def _load_cached_token(self, cache_key: str) -> Optional[str]:
+        """Return a cached access token that is still valid, else None"""
+        cached = _read_cache(_cache_path(cache_key))
+        if cached and cached.get('expires_at', 0) - TOKEN_EXPIRY_MARGIN > time.time():
+            return cached.get('access_token')
+        return None
+
+    def _save_cached_token(self, cache_key: str, token: str, expires_in: int):
+        _write_cache(_cache_path(cache_key), {'access_token': token, 'expires_at': time.time() + expires_in})
+
+    def _cached_metadata(self, kind: str, fetch) -> List[Dict]:
+        """Return `fetch()`'s result, served from disk for metadata_cache_ttl seconds.
+
+        Keyed by the secret path, which identifies the customer portal.
+        """
+        if not self.metadata_cache_ttl or not self.secret_path:
+            return fetch()
+        path = _cache_path(f'{self.secret_path}:{kind}', prefix='meta-')
+        cached = _read_cache(path)
+        if cached and time.time() - cached.get('fetched_at', 0) < self.metadata_cache_ttl:
+            return cached['data']
+        data = fetch()
+        _write_cache(path, {'fetched_at': time.time(), 'data': data})
+        return data
+
+    def _apply_auth(self):
+        """Attach the token to the HTTP session once, instead of on every request"""
         if self.auth_type == 'bearer':
-            headers['Authorization'] = f'Bearer {self.token}'
+            self.http.headers['Authorization'] = f'Bearer {self.token}'
         else:  # hapikey
-            params['hapikey'] = self.token
-        if extra_params:
-            params.update(extra_params)
-        return requests.post(url, headers=headers, params=params, json=payload)
+            self.http.params['hapikey'] = self.token
+
+    def _request_with_reauth(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request; on 401 with OAuth credentials, refresh the token and retry once"""
+        token = self.token
+        response = self.http.request(method, url, **kwargs)
+        if response.status_code != 401 or not self.oauth_credentials:
+            return response
+
+        with self._refresh_lock:
+            # Another thread may already have refreshed while this one waited
+            if self.token == token:
+                console.print("[cyan]Access token rejected, refreshing...[/cyan]")
+                self.token = self._refresh_oauth_token(self.oauth_credentials)
+                self._apply_auth()
+        return self.http.request(method, url, **kwargs)
+
+    def _request_json(self, method: str, url: str, *, params: Dict = None, payload: Dict = None) -> Dict:
+        """Authenticated request returning the decoded JSON body; raises on HTTP errors.
+
+        Errors are reported once by run_query / run_search_objects.
+        """
+        data = json_dumps(payload) if payload is not None else None
+        response = self._request_with_reauth(method, url, params=params, data=data)
+        response.raise_for_status()
+        return json_loads(response.content)
 
     def get_all_properties(self, object_type: str) -> List[Dict]:
         """Fetch all properties for a given object type"""
-        url = f"{BASE_URL}/crm/v3/properties/{object_type}"
-        try:
+        def fetch():
             console.print(f"[cyan]Fetching properties for: {object_type}[/cyan]")
-            response = self._get(url)
-            response.raise_for_status()
-            return response.json().get('results', [])
-        except Exception as e:
-            console.print(f"[red]Error fetching properties: {str(e)}[/red]")
-            if hasattr(e, 'response') and e.response is not None:
-                console.print(f"[red]Response: {e.response.text}[/red]")
-            raise
+            return self._request_json('GET', f"{BASE_URL}/crm/v3/properties/{object_type}").get('results', [])
+        return self._cached_metadata(f'properties:{object_type}', fetch)
 
     def count_records(self, object_type: str) -> int:
         """Get total record count for an object type"""
-        url = f"{BASE_URL}/crm/v3/objects/{object_type}/search"
+        url = f"{OBJECTS_URL}/{object_type}/search"
+        if self._limit0_ok:
+            # limit 0 returns just `total` with no result rows
+            payload = {'filterGroups': [], 'limit': 0, 'properties': []}
+            try:
+                return self._request_json('POST', url, payload=payload).get('total', 0)
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 400:
+                    return -1
+                # Remember the rejection so later counts send one request, not two
+                self._limit0_ok = False
+            except Exception:
+                return -1
+        # If limit 0 is rejected, fall back to a single minimal row
         payload = {'filterGroups': [], 'limit': 1, 'properties': ['hs_object_id']}
         try:
-            response = self._post(url, payload)
-            response.raise_for_status()
-            return response.json().get('total', 0)
+            return self._request_json('POST', url, payload=payload).get('total', 0)
         except Exception:
             return -1
 
     def list_records(self, object_type: str, properties: List[str] = None, limit: int = 20) -> List[Dict]:
         """List records using the basic GET endpoint"""
-        url = f"{BASE_URL}/crm/v3/objects/{object_type}"
+        url = f"{OBJECTS_URL}/{object_type}"
         extra_params = {'limit': min(limit, 100)}
         if properties:
             extra_params['properties'] = ','.join(properties)
-        try:
-            console.print(f"[cyan]Fetching {object_type} records...[/cyan]")
-            response = self._get(url, extra_params)
-            response.raise_for_status()
-            return response.json().get('results', [])
-        except Exception as e:
-            console.print(f"[red]Error listing records: {str(e)}[/red]")
-            if hasattr(e, 'response') and e.response is not None:
-                console.print(f"[red]Response: {e.response.text}[/red]")
-            raise
+        console.print(f"[cyan]Fetching {object_type} records...[/cyan]")
+        return self._request_json('GET', url, params=extra_params).get('results', [])
 
     def search_records(self, object_type: str, filters: List[Dict],
                        properties: List[str] = None, limit: int = 100) -> Dict[str, Any]:
         """Search records using the HubSpot search endpoint with filters"""
-        url = f"{BASE_URL}/crm/v3/objects/{object_type}/search"
+        url = f"{OBJECTS_URL}/{object_type}/search"
         payload = {
             'filterGroups': [{'filters': filters}] if filters else [],
             'limit': min(limit, 100),
         }
         if properties:
             payload['properties'] = properties
-        try:
-            console.print(f"[cyan]Searching {object_type} records...[/cyan]")
-            response = self._post(url, payload)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            console.print(f"[red]Error searching records: {str(e)}[/red]")
-            if hasattr(e, 'response') and e.response is not None:
-                console.print(f"[red]Response: {e.response.text}[/red]")
-            raise
+        console.print(f"[cyan]Searching {object_type} records...[/cyan]")
+        return self._request_json('POST', url, payload=payload)
 
-    def fetch_all_records(self, object_type: str, all_property_names: List[str], limit: int) -> List[Dict]:
-        """Fetch records with all properties, paginating up to limit"""
-        url = f"{BASE_URL}/crm/v3/objects/{object_type}/search"
-        records = []
-        after = None
+    def _search_page(self, url: str, property_names: List[str], batch_size: int, after: str = None) -> Dict:
+        """Fetch one page from the search endpoint"""
+        payload = {
+            'filterGroups': [],
+            'properties': property_names,
+            'limit': batch_size,
+        }
+        if after:
+            payload['after'] = after
+        return self._request_json('POST', url, payload=payload)
 
-        while len(records) < limit:
-            batch_size = min(100, limit - len(records))
-            payload = {
-                'filterGroups': [],
-                'properties': all_property_names,
-                'limit': batch_size,
-            }
-            if after:
-                payload['after'] = after
+    def iter_all_records(self, object_type: str, all_property_names: List[str], limit: int) -> Iterator[Dict]:
+        """Yield records with all properties page by page, up to limit.
 
-            response = self._post(url, payload)
-            response.raise_for_status()
-            data = response.json()
+        The search API's `after` cursor is a plain record offset, so once the
+        first page confirms that, the following pages are fetched concurrently,
+        a bounded window ahead of the consumer. Any other cursor falls back to
+        following `after` one page at a time.
+        """
+        url = f"{OBJECTS_URL}/{object_type}/search"
+
+        data = self._search_page(url, all_property_names, min(100, limit))
+        records = data.get('results', [])
+        yield from records
+        after = data.get('paging', {}).get('next', {}).get('after')
+        if not after or not records:
+            return
+
+        if after == str(len(records)):
+            end = min(limit, data.get('total', limit))
+            offsets = iter(range(len(records), end, 100))
+            with ThreadPoolExecutor(max_workers=PAGE_WORKERS) as executor:
+                def submit(offset):
+                    return executor.submit(
+                        self._search_page, url, all_property_names, min(100, end - offset), str(offset)
+                    )
+
+                window = deque(map(submit, islice(offsets, PAGE_WORKERS * 2)))
+                while window:
+                    page = window.popleft().result()
+                    for offset in islice(offsets, 1):
+                        window.append(submit(offset))
+                    yield from page.get('results', [])
+            return
+
+        fetched = len(records)
+        while fetched < limit:
+            data = self._search_page(url, all_property_names, min(100, limit - fetched), after)
 
             batch = data.get('results', [])
-            records.extend(batch)
+            fetched += len(batch)
+            yield from batch
 
             paging = data.get('paging', {})
             after = paging.get('next', {}).get('after')
             if not after or not batch:
                 break
 
+    def batch_read_records(self, object_type: str, ids: List[str], property_names: List[str]) -> List[Dict]:
+        """Fetch specific records by ID via the batch read API (100 IDs per request)"""
+        url = f"{OBJECTS_URL}/{object_type}/batch/read"
+
+        def read_chunk(chunk: List[str]) -> List[Dict]:
+            payload = {
+                'inputs': [{'id': str(record_id)} for record_id in chunk],
+                'properties': property_names,
+            }
+            return self._request_json('POST', url, payload=payload).get('results', [])
+
+        chunks = [ids[i:i + 100] for i in range(0, len(ids), 100)]
+        records = []
+        with ThreadPoolExecutor(max_workers=PAGE_WORKERS) as executor:
+            for batch in executor.map(read_chunk, chunks):
+                records.extend(batch)
         return records
 
     def get_object_schemas(self) -> List[Dict]:
         """Get all custom object schemas"""
-        url = f"{BASE_URL}/crm/v3/schemas"
         try:
-            response = self._get(url)
-            response.raise_for_status()
-            return response.json().get('results', [])
+            return self._cached_metadata(
+                'schemas', lambda: self._request_json('GET', f"{BASE_URL}/crm/v3/schemas").get('results', [])
+            )
         except Exception as e:
             console.print(f"[yellow]Could not fetch custom schemas: {str(e)}[/yellow]")
             return []
 
-    def flatten_record(self, record: Dict) -> Dict:
-        """Flatten HubSpot record structure: {id, properties: {...}} → one flat dict"""
-        flat = {'id': record.get('id', '')}
-        flat.update(record.get('properties', {}))
-        return flat
+    def _collect_fields(self, records: List[Dict]) -> List[str]:
+        """'id' followed by every property name seen across records, sorted"""
+        seen = {}
+        for record in records:
+            seen.update(dict.fromkeys(record.get('properties', {})))
+        seen.pop('id', None)
+        return ['id'] + sorted(seen)
+
+    def _write_workbook(self, sheet_title: str, headers: List[str], rows: List[List], filepath: str,
+                        widths: List[int] = None):
+        """Stream header + rows into a write-only workbook and save it.
+
+        Write-only sheets need column widths before the first row is appended.
+        Pass the max value length per column as `widths` if the caller already
+        measured it while building rows; otherwise it is measured here.
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(sheet_title)
+
+        if widths is None:
+            widths = [len(str(h)) for h in headers]
+            for row in rows:
+                for col_idx, value in enumerate(row):
+                    length = len(str(value))
+                    if length > widths[col_idx]:
+                        widths[col_idx] = length
+        for col_idx, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = min(width + 2, 50)
+
+        header_fill, header_font = _header_styles()
+
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.fill = header_fill
+            cell.font = header_font
+            header_cells.append(cell)
+        ws.append(header_cells)
 
-    def save_to_excel(self, records: List[Dict], object_type: str, save_directory: str) -> Optional[str]:
-        """Save query results to Excel"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Query Results"
+        for row in rows:
+            ws.append(row)
 
-        if not records:
-            console.print("[yellow]No records to save[/yellow]")
-            return None
+        wb.save(filepath)
 
-        flat_records = [self.flatten_record(r) for r in records]
+    def _export_rows(self, records: Iterable[Dict], fields: List[str], widths: List[int] = None) -> Iterator[List]:
+        """Yield one export row per record, widening `widths` in place if given.
 
-        all_fields = set()
-        for record in flat_records:
-            all_fields.update(record.keys())
-        all_fields = ['id'] + sorted(f for f in all_fields if f != 'id')
+        Values are read straight from record['properties'] (and 'id' from the
+        record itself) rather than from a flattened copy.
+        """
+        for record in records:
+            props = record.get('properties', {})
+            row = []
+            for col_idx, field in enumerate(fields):
+                value = record.get('id', '') if field == 'id' else props.get(field, '')
+                if isinstance(value, (dict, list)):
+                    value = json_dumps(value).decode()
+                row.append(value)
+                if widths is not None:
+                    length = len(str(value))
+                    if length > widths[col_idx]:
+                        widths[col_idx] = length
+            yield row
+
+    def save_to_excel_streaming(self, records: Iterable[Dict], fields: List[str],
+                                object_type: str, save_directory: str) -> Tuple[Optional[str], int]:
+        """Write records to Excel as they arrive; returns (filepath, record count).
+
+        Only the first WIDTH_SAMPLE_ROWS records are buffered (to size the
+        columns); the rest go straight from the iterator into the sheet.
+        """
+        records = iter(records)
+        widths = [len(f) for f in fields]
+        head = list(self._export_rows(islice(records, WIDTH_SAMPLE_ROWS), fields, widths))
+        if not head:
+            console.print("[yellow]No records to save[/yellow]")
+            return None, 0
 
-        # HubSpot orange header
-        header_fill = PatternFill(start_color="FF7A00", end_color="FF7A00", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
+        count = len(head)
 
-        for col_idx, field in enumerate(all_fields, 1):
-            cell = ws.cell(row=1, column=col_idx, value=field)
-            cell.fill = header_fill
-            cell.font = header_font
-
-        for row_idx, record in enumerate(flat_records, 2):
-            for col_idx, field in enumerate(all_fields, 1):
-                value = record.get(field, '')
-                if isinstance(value, dict):
-                    value = str(value)
-                ws.cell(row=row_idx, column=col_idx, value=value)
-
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
+        def rows():
+            nonlocal count
+            yield from head
+            for row in self._export_rows(records, fields):
+                count += 1
+                yield row
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{object_type}_records_{timestamp}.xlsx"
         filepath = os.path.join(save_directory, filename)
-        wb.save(filepath)
-        return filepath
+        self._write_workbook("Query Results", fields, rows(), filepath, widths)
+        return filepath, count
 
     def save_shape_to_excel(self, properties: List[Dict], object_type: str, save_directory: str) -> Optional[str]:
         """Save property schema to Excel"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Object Shape"
-
         if not properties:
             console.print("[yellow]No properties found[/yellow]")
             return None
 
-        header_fill = PatternFill(start_color="FF7A00", end_color="FF7A00", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-
         headers = ['Property Name', 'Label', 'Type', 'Field Type', 'Group']
-        for col_idx, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-
-        for row_idx, prop in enumerate(properties, 2):
-            ws.cell(row=row_idx, column=1, value=prop.get('name', ''))
-            ws.cell(row=row_idx, column=2, value=prop.get('label', ''))
-            ws.cell(row=row_idx, column=3, value=prop.get('type', ''))
-            ws.cell(row=row_idx, column=4, value=prop.get('fieldType', ''))
-            ws.cell(row=row_idx, column=5, value=prop.get('groupName', ''))
-
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
+        rows = list(map(PROPERTY_ROW, properties))
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{object_type}_shape_{timestamp}.xlsx"
         filepath = os.path.join(save_directory, filename)
-        wb.save(filepath)
+        self._write_workbook("Object Shape", headers, rows, filepath)
         return filepath
 
     def display_records(self, records: List[Dict], title: str = "Results"):
@@ -408,30 +665,36 @@ class HubSpotQueryTool:
             console.print("[yellow]No records returned[/yellow]")
             return
 
-        flat_records = [self.flatten_record(r) for r in records]
-
-        all_fields = set()
-        for r in flat_records:
-            all_fields.update(r.keys())
-        sorted_fields = ['id'] + sorted(f for f in all_fields if f != 'id')
+        # Only the displayed rows are scanned, and only their columns shown
+        display_count = min(20, len(records))
+        displayed = records[:display_count]
+        sorted_fields = self._collect_fields(displayed)
 
         table = Table(title=title, show_lines=True)
         for field in sorted_fields:
             table.add_column(field, style="cyan")
 
-        display_count = min(20, len(flat_records))
-        for record in flat_records[:display_count]:
-            row = [str(record.get(field, '')) for field in sorted_fields]
-            table.add_row(*row)
+        for record in displayed:
+            props = record.get('properties', {})
+            table.add_row(str(record.get('id', '')), *[str(props.get(field, '')) for field in sorted_fields[1:]])
 
         console.print(table)
 
-        if len(flat_records) > display_count:
-            console.print(f"\n[yellow]Showing {display_count} of {len(flat_records)} records[/yellow]")
+        if len(records) > display_count:
+            console.print(f"\n[yellow]Showing {display_count} of {len(records)} records[/yellow]")
+
+    def _print_error(self, e: Exception, message: str = "Error"):
+        """Report a failed call, including the start of the API's response body when there is one"""
+        console.print(f"[bold red]{message}: {str(e)}[/bold red]")
+        response = getattr(e, 'response', None)
+        if response is not None:
+            body = response.content[:ERROR_BODY_LIMIT].decode('utf-8', 'replace')
+            console.print(f"Response: {body}", style="red", markup=False)
 
     def run_query(self, secret_path: str, object_type: str, query_type: str,
                   search_filters: List[Dict], properties: List[str],
-                  query_limit: int, always_refresh: bool = True, save_directory: str = None):
+                  query_limit: int, always_refresh: bool = True, save_directory: str = None,
+                  record_ids: List[str] = None, exclude_calculated: bool = False):
         """Main execution flow"""
         try:
             # Ask for save directory if needed
@@ -530,20 +793,33 @@ class HubSpotQueryTool:
 
             # --- ALL ---
             if query_type.lower() == 'all':
-                with console.status(f"[bold green]Fetching all properties for {object_type}..."):
-                    all_props = self.get_all_properties(object_type)
-                all_prop_names = [p['name'] for p in all_props]
-                console.print(f"[cyan]Found {len(all_prop_names)} properties, fetching records...[/cyan]")
-
-                with console.status(f"[bold green]Fetching {object_type} records..."):
-                    records = self.fetch_all_records(object_type, all_prop_names, query_limit)
+                if properties:
+                    all_prop_names = list(properties)
+                    console.print(f"[cyan]Using {len(all_prop_names)} configured properties, fetching records...[/cyan]")
+                else:
+                    with console.status(f"[bold green]Fetching all properties for {object_type}..."):
+                        all_props = self.get_all_properties(object_type)
+                    if exclude_calculated:
+                        all_prop_names = [p['name'] for p in all_props if not p.get('calculated')]
+                        console.print(f"[cyan]Found {len(all_prop_names)} non-calculated properties "
+                                      f"({len(all_props) - len(all_prop_names)} calculated skipped), fetching records...[/cyan]")
+                    else:
+                        all_prop_names = [p['name'] for p in all_props]
+                        console.print(f"[cyan]Found {len(all_prop_names)} properties, fetching records...[/cyan]")
+
+                # Columns are the requested properties, so pages can be written as they arrive
+                export_fields = ['id'] + sorted(set(all_prop_names) - {'id'})
+                with console.status(f"[bold green]Fetching {object_type} records and saving to Excel..."):
+                    if record_ids:
+                        records = self.batch_read_records(object_type, record_ids, all_prop_names)
+                    else:
+                        records = self.iter_all_records(object_type, all_prop_names, query_limit)
+                    filepath, count = self.save_to_excel_streaming(records, export_fields, object_type, save_directory)
 
-                console.print(f"[cyan]Saving {len(records)} records to Excel...[/cyan]")
-                filepath = self.save_to_excel(records, object_type, save_directory)
                 if filepath:
                     console.print(f"\n[bold green]✓ Results saved![/bold green]")
                     console.print(f"[cyan]File:[/cyan] {filepath}")
-                    console.print(f"[cyan]Records:[/cyan] {len(records)}")
+                    console.print(f"[cyan]Records:[/cyan] {count}")
                     console.print(f"[cyan]Properties:[/cyan] {len(all_prop_names)}\n")
                 return
 
@@ -568,10 +844,11 @@ class HubSpotQueryTool:
                 return
 
         except Exception as e:
-            console.print(f"[bold red]Error: {str(e)}[/bold red]")
+            self._print_error(e)
             raise
 
-    def run_search_objects(self, secret_path: str, search_filter: str = None, always_refresh: bool = True):
+    def run_search_objects(self, secret_path: str, search_filter: str = None, always_refresh: bool = True,
+                           rate_per_minute: int = 240):
         """List all available HubSpot object types with record counts"""
         try:
             with console.status("[bold green]Fetching credentials from AWS..."):
@@ -583,18 +860,17 @@ class HubSpotQueryTool:
             with console.status("[bold green]Fetching custom object schemas..."):
                 custom_schemas = self.get_object_schemas()
 
-            all_objects = [{'name': o, 'label': o.title(), 'type': 'standard'} for o in STANDARD_OBJECTS]
+            all_objects = list(STANDARD_OBJECT_ROWS)
             for schema in custom_schemas:
-                all_objects.append({
-                    'name': schema.get('fullyQualifiedName', schema.get('name', '')),
-                    'label': schema.get('labels', {}).get('singular', schema.get('name', '')),
-                    'type': 'custom',
-                })
+                name = schema.get('fullyQualifiedName', schema.get('name', ''))
+                label = schema.get('labels', {}).get('singular', schema.get('name', ''))
+                all_objects.append({'name': name, 'label': label, 'type': 'custom',
+                                    'search_text': f"{name}\n{label}".lower()})
 
-            # Apply filter
+            # Apply filter against the pre-lowered name + label
             if search_filter:
                 term = search_filter.lower()
-                filtered = [o for o in all_objects if term in o['name'].lower() or term in o['label'].lower()]
+                filtered = [o for o in all_objects if term in o['search_text']]
                 console.print(f"[cyan]Found {len(filtered)} object(s) matching '{search_filter}'[/cyan]\n")
             else:
                 filtered = all_objects
@@ -610,18 +886,31 @@ class HubSpotQueryTool:
             table.add_column("Type", style="magenta")
             table.add_column("Record Count", style="yellow", justify="right")
 
+            counts = {}
+            limiter = RateLimiter(rate_per_minute)
+
+            def count(name: str) -> int:
+                limiter.acquire()
+                return self.count_records(name)
+
             with console.status("[bold green]Counting records...") as status:
-                for idx, obj in enumerate(filtered, 1):
-                    status.update(f"[bold green]Counting records... ({idx}/{len(filtered)}) {obj['name']}")
-                    count = self.count_records(obj['name'])
-                    count_str = str(count) if count >= 0 else "Error"
-                    table.add_row(obj['name'], obj['label'], obj['type'], count_str)
+                with ThreadPoolExecutor(max_workers=min(COUNT_WORKERS, len(filtered))) as executor:
+                    futures = {executor.submit(count, obj['name']): obj['name'] for obj in filtered}
+                    for idx, future in enumerate(as_completed(futures), 1):
+                        name = futures[future]
+                        counts[name] = future.result()
+                        status.update(f"[bold green]Counting records... ({idx}/{len(filtered)}) {name}")
+
+            for obj in filtered:
+                count = counts[obj['name']]
+                count_str = str(count) if count >= 0 else "Error"
+                table.add_row(obj['name'], obj['label'], obj['type'], count_str)
 
             console.print(table)
             console.print(f"\n[green]Displayed {len(filtered)} object(s)[/green]\n")
 
         except Exception as e:
-            console.print(f"[bold red]Error: {str(e)}[/bold red]")
+            self._print_error(e)
             raise
 
 
@@ -633,8 +922,16 @@ def main():
     tool = HubSpotQueryTool(
         profile=CONFIG['aws_profile'],
         region=CONFIG['aws_region'],
+        metadata_cache_ttl=CONFIG['metadata_cache_ttl'],
     )
 
+    try:
+        _run(tool)
+    finally:
+        tool.close()
+
+
+def _run(tool: HubSpotQueryTool):
     if CONFIG['search_objects_mode']:
         if not CONFIG['secret_path']:
             console.print("[red]Error: 'secret_path' is not set in CONFIG[/red]")
@@ -644,6 +941,7 @@ def main():
             secret_path=CONFIG['secret_path'],
             search_filter=CONFIG['search_objects_filter'],
             always_refresh=CONFIG['always_refresh_token'],
+            rate_per_minute=CONFIG['discover_rate_per_minute'],
         )
         return
 
@@ -665,6 +963,8 @@ def main():
         properties=CONFIG['properties'],
         query_limit=CONFIG['query_limit'],
         always_refresh=CONFIG['always_refresh_token'],
+        record_ids=CONFIG['record_ids'],
+        exclude_calculated=CONFIG['exclude_calculated_properties'],
     )
 
 
@@ -1,58 +1,129 @@
 #!/usr/bin/env python3
 """
 CRM Query Tools — HubSpot & Salesforce query UI.
-AWS session is read from st.session_state (set by app.py).
+The Secrets Manager client and AWS identity are read from st.session_state (set by app.py).
 """
 
 import io
 import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlencode
 
-import boto3
+import pandas as pd
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
 
-# All outbound HTTP requests use this timeout (seconds).
-REQUEST_TIMEOUT = 10
+from http_timeouts import REQUEST_TIMEOUT
 
-# Delay between each COUNT call in discover mode (seconds).
+# orjson parses large CRM responses several times faster; fall back to the
+# stdlib when it isn't installed. json_dumps always returns bytes.
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+
+# Delay between starting each COUNT call in discover mode (seconds), used
+# whenever the API hasn't told us how much rate-limit quota is left.
 DISCOVER_DELAY = 0.1
 
-# ── Shared helpers ────────────────────────────────────────────────────────────
+# HubSpot's search API (which discover COUNTs go through) allows 5 requests
+# per second per portal, so HubSpot counts start at least this far apart.
+HUBSPOT_SEARCH_INTERVAL = 0.2
+
+# With fewer than this many requests left in HubSpot's search rate-limit
+# window, discover spreads the rest over the window instead.
+RATE_LIMIT_HEADROOM = 20
 
+# Salesforce discover pauses between batches only once the org has used
+# this share of its daily API allowance (from the Sforce-Limit-Info header).
+SF_API_USAGE_THROTTLE = 0.9
 
-def make_excel(records: List[Dict], sheet_name: str = "Results") -> bytes:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = sheet_name
+# Maximum COUNT calls in flight at once in discover mode.
+DISCOVER_WORKERS = 4
 
-    if not records:
-        buf = io.BytesIO()
-        wb.save(buf)
-        return buf.getvalue()
+# HubSpot search pages in flight at once when paging "all" queries: the next
+# page is requested while the current one downloads. Search allows ~5 req/s.
+PAGE_WORKERS = 2
 
-    all_fields = list(dict.fromkeys(k for r in records for k in r.keys()))
+# Widest an exported Excel column is auto-sized to (characters).
+MAX_COLUMN_WIDTH = 50
 
-    fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    font = Font(bold=True, color="FFFFFF")
+# Excel header styling, built once and shared by every export.
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+HEADER_FONT = Font(bold=True, color="FFFFFF")
 
-    for ci, field in enumerate(all_fields, 1):
-        cell = ws.cell(row=1, column=ci, value=field)
-        cell.fill = fill
-        cell.font = font
+# ── Shared helpers ────────────────────────────────────────────────────────────
 
-    for ri, row in enumerate(records, 2):
-        for ci, field in enumerate(all_fields, 1):
-            val = row.get(field, "")
-            ws.cell(row=ri, column=ci, value=str(val) if isinstance(val, dict) else val)
 
-    for col in ws.columns:
-        width = min(max((len(str(c.value or "")) for c in col), default=10) + 2, 50)
-        ws.column_dimensions[col[0].column_letter].width = width
+def make_excel(records: Union[List[Dict], pd.DataFrame], sheet_name: str = "Results") -> bytes:
+    """Build an .xlsx from a DataFrame or a list of flat dicts (one column per key).
+
+    Uses a write-only workbook: cells are streamed into the file rather than
+    kept as Cell objects. Write-only sheets need column widths before the
+    first row, so widths are measured from the column buffers up front.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+
+    if len(records):
+        # Column-major buffers: each value is placed once by column index
+        # instead of looking up every field in every record.
+        if isinstance(records, pd.DataFrame):
+            all_fields = [str(c) for c in records.columns]
+            frame = records.astype(object).where(records.notna(), None)
+            columns = [frame.iloc[:, ci].tolist() for ci in range(len(all_fields))]
+        else:
+            all_fields = list(dict.fromkeys(k for r in records for k in r.keys()))
+            index = {f: ci for ci, f in enumerate(all_fields)}
+            columns = [[""] * len(records) for _ in all_fields]
+            for ri, r in enumerate(records):
+                for k, v in r.items():
+                    columns[index[k]][ri] = v
+
+        # Measured widths stop growing once the column reaches the cap
+        full = MAX_COLUMN_WIDTH - 2
+        widths = []
+        for field, col in zip(all_fields, columns):
+            width = len(field)
+            for ri, val in enumerate(col):
+                if isinstance(val, dict):
+                    val = col[ri] = str(val)
+                if width >= full:
+                    continue
+                if isinstance(val, str):
+                    n = len(val)
+                else:
+                    n = len(str(val)) if val is not None else 0
+                if n > width:
+                    width = n
+            widths.append(width)
+
+        for ci, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(ci)].width = min(width + 2, MAX_COLUMN_WIDTH)
+
+        header = []
+        for field in all_fields:
+            cell = WriteOnlyCell(ws, value=field)
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+            header.append(cell)
+        ws.append(header)
+        for row in zip(*columns):
+            ws.append(row)
 
     buf = io.BytesIO()
     wb.save(buf)
@@ -72,6 +143,58 @@ def ts() -> str:
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
 
+def count_concurrently(count: Callable[[str], int], names: Iterable[str],
+                       pace: Callable[[], float] = lambda: DISCOVER_DELAY) -> Iterator[Tuple[str, int]]:
+    """Yield (name, count) as each COUNT finishes.
+
+    Up to DISCOVER_WORKERS run at once. Each start is spaced from the previous
+    one by `pace()` seconds, re-read as calls complete (so it can follow the
+    API's rate-limit headers).
+    """
+    lock = threading.Lock()
+    next_start = time.monotonic()
+
+    def run(name: str) -> Tuple[str, int]:
+        nonlocal next_start
+        with lock:
+            now = time.monotonic()
+            wait = next_start - now
+            next_start = max(now, next_start) + pace()
+        if wait > 0:
+            time.sleep(wait)
+        return name, count(name)
+
+    with ThreadPoolExecutor(max_workers=DISCOVER_WORKERS) as executor:
+        futures = [executor.submit(run, name) for name in names]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def new_http_session() -> requests.Session:
+    """Keep-alive session sized for DISCOVER_WORKERS concurrent calls to one host.
+
+    429s from concurrent calls and transient 5xx errors are retried with
+    backoff (honouring Retry-After).
+    """
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET", "POST"], raise_on_status=False)
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=max(DISCOVER_WORKERS, 10),
+                                          max_retries=retry))
+    return session
+
+
+# Secret values are cached per AWS identity (access key + region + credentials
+# fingerprint) so one user's credentials never serve another's lookup, and
+# re-pasted STS credentials never reuse a client bound to the expired token.
+
+
+@st.cache_resource(ttl=600, show_spinner=False)
+def _get_secret(_sm, access_key: str, region: str, creds_fingerprint: str, secret_path: str) -> Dict:
+    resp = _sm.get_secret_value(SecretId=secret_path)
+    return json_loads(resp["SecretString"])
+
+
 # ── HubSpot client ────────────────────────────────────────────────────────────
 
 HUBSPOT_BASE = "https://api.hubapi.com"
@@ -83,38 +206,45 @@ HUBSPOT_STANDARD_OBJECTS = [
 
 
 class HubSpotClient:
-    def __init__(self, boto_session: boto3.Session):
-        self.sm = boto_session.client("secretsmanager")
+    def __init__(self, sm, aws_identity: Tuple[str, str, str]):
+        self.sm = sm
+        self.aws_identity = aws_identity
         self.token: Optional[str] = None
         self.auth_type: Optional[str] = None
+        self._session = new_http_session()
+        self._oauth_creds: Optional[Dict] = None  # kept to refresh the token on a 401
+        self._auth_lock = threading.Lock()
+        self._search_headers: Dict = {}  # from the last search response only
 
     def load_secret(self, secret_path: str, always_refresh: bool = True):
-        resp = self.sm.get_secret_value(SecretId=secret_path)
-        creds = json.loads(resp["SecretString"])
+        creds = _get_secret(self.sm, *self.aws_identity, secret_path)
         self._authenticate(creds, always_refresh)
 
     def _authenticate(self, creds: Dict, always_refresh: bool):
+        self.token, self.auth_type = self._resolve_token(creds, always_refresh)
+        # Attach auth to the session once rather than building it per request
+        if self.auth_type == "bearer":
+            self._session.headers["Authorization"] = f"Bearer {self.token}"
+        else:
+            self._session.params["hapikey"] = self.token
+
+    def _resolve_token(self, creds: Dict, always_refresh: bool) -> Tuple[str, str]:
         if creds.get("hapikey"):
-            self.token = creds["hapikey"]
-            self.auth_type = "hapikey"
-            return
+            return creds["hapikey"], "hapikey"
 
         has_oauth = all(k in creds for k in ("client_id", "client_secret", "refresh_token"))
         if always_refresh and has_oauth:
-            self.token = self._refresh_oauth(creds)
-            self.auth_type = "bearer"
-            return
+            self._oauth_creds = creds
+            return self._refresh_oauth(creds), "bearer"
 
         for key in ("access_token", "token", "api_key"):
             if creds.get(key):
-                self.token = creds[key]
-                self.auth_type = "bearer"
-                return
+                return creds[key], "bearer"
 
         raise ValueError(f"No usable token found. Keys present: {list(creds.keys())}")
 
     def _refresh_oauth(self, creds: Dict) -> str:
-        r = requests.post(
+        r = self._session.post(
             "https://api.hubapi.com/oauth/v1/token",
             data={
                 "grant_type": "refresh_token",
@@ -122,50 +252,62 @@ class HubSpotClient:
                 "client_secret": creds["client_secret"],
                 "refresh_token": creds["refresh_token"],
             },
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            # Don't send a stale bearer from the session to the token endpoint
+            headers={"Content-Type": "application/x-www-form-urlencoded", "Authorization": None},
             timeout=REQUEST_TIMEOUT,
         )
         r.raise_for_status()
-        return r.json()["access_token"]
+        return json_loads(r.content)["access_token"]
+
+    def _request(self, method: str, path: str, **kwargs) -> Dict:
+        """Send a request; an expired OAuth token (401) is refreshed once and the call retried."""
+        token = self.token
+        r = self._session.request(method, f"{HUBSPOT_BASE}{path}", timeout=REQUEST_TIMEOUT, **kwargs)
+        if r.status_code == 401 and self._oauth_creds:
+            with self._auth_lock:
+                if self.token == token:  # not already refreshed by another thread
+                    self.token = self._refresh_oauth(self._oauth_creds)
+                    self._session.headers["Authorization"] = f"Bearer {self.token}"
+            r = self._session.request(method, f"{HUBSPOT_BASE}{path}", timeout=REQUEST_TIMEOUT, **kwargs)
+        # Search is limited separately from other endpoints; only its headers
+        # describe the quota that discover COUNTs draw on
+        if path.endswith("/search"):
+            self._search_headers = r.headers
+        r.raise_for_status()
+        return json_loads(r.content)
 
-    def _headers(self) -> Dict:
-        if self.auth_type == "bearer":
-            return {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"}
-        return {"Content-Type": "application/json"}
+    def pace_delay(self) -> float:
+        """Seconds to wait before the next discover call.
 
-    def _params(self, extra: Dict = None) -> Dict:
-        p = {}
-        if self.auth_type == "hapikey":
-            p["hapikey"] = self.token
-        if extra:
-            p.update(extra)
-        return p
+        Never less than HUBSPOT_SEARCH_INTERVAL. If a search response reported
+        rate-limit headers and little quota is left, the remainder is spread
+        over the window instead.
+        """
+        headers = self._search_headers
+        try:
+            remaining = int(headers["X-HubSpot-RateLimit-Remaining"])
+            window_ms = int(headers["X-HubSpot-RateLimit-Interval-Milliseconds"])
+        except (KeyError, ValueError):
+            return HUBSPOT_SEARCH_INTERVAL
+        if remaining >= RATE_LIMIT_HEADROOM:
+            return HUBSPOT_SEARCH_INTERVAL
+        return max(HUBSPOT_SEARCH_INTERVAL, window_ms / 1000 / max(remaining, 1))
 
     def _get(self, path: str, params: Dict = None) -> Dict:
-        r = requests.get(
-            f"{HUBSPOT_BASE}{path}",
-            headers=self._headers(),
-            params=self._params(params),
-            timeout=REQUEST_TIMEOUT,
-        )
-        r.raise_for_status()
-        return r.json()
+        return self._request("GET", path, params=params)
 
     def _post(self, path: str, payload: Dict) -> Dict:
-        r = requests.post(
-            f"{HUBSPOT_BASE}{path}",
-            headers=self._headers(),
-            params=self._params(),
-            json=payload,
-            timeout=REQUEST_TIMEOUT,
-        )
-        r.raise_for_status()
-        return r.json()
+        return self._request("POST", path, data=json_dumps(payload), headers={"Content-Type": "application/json"})
+
+    def total(self, obj: str) -> int:
+        """Record count for an object; errors are raised."""
+        d = self._post(f"/crm/v3/objects/{obj}/search", {"filterGroups": [], "limit": 1, "properties": ["hs_object_id"]})
+        return d.get("total", 0)
 
     def count(self, obj: str) -> int:
+        """Record count for discover, where -1 marks a failed count."""
         try:
-            d = self._post(f"/crm/v3/objects/{obj}/search", {"filterGroups": [], "limit": 1, "properties": ["hs_object_id"]})
-            return d.get("total", 0)
+            return self.total(obj)
         except Exception:
             return -1
 
@@ -187,14 +329,38 @@ class HubSpotClient:
             payload["properties"] = properties
         return self._post(f"/crm/v3/objects/{obj}/search", payload)
 
+    def _search_page(self, obj: str, prop_names: List[str], batch_size: int, after: Optional[str] = None) -> Dict:
+        payload: Dict[str, Any] = {"filterGroups": [], "properties": prop_names, "limit": batch_size}
+        if after:
+            payload["after"] = after
+        return self._post(f"/crm/v3/objects/{obj}/search", payload)
+
     def fetch_all(self, obj: str, prop_names: List[str], limit: int) -> List[Dict]:
-        records, after = [], None
+        """Page through search results up to limit.
+
+        The search `after` cursor is a plain record offset, so once the first
+        page confirms that, later pages are requested ahead (PAGE_WORKERS in
+        flight). Any other cursor is followed one page at a time.
+        """
+        data = self._search_page(obj, prop_names, min(100, limit))
+        records = data.get("results", [])
+        after = data.get("paging", {}).get("next", {}).get("after")
+        if not after or not records:
+            return records
+
+        if after == str(len(records)):
+            end = min(limit, data.get("total", limit))
+            with ThreadPoolExecutor(max_workers=PAGE_WORKERS) as executor:
+                pages = executor.map(
+                    lambda offset: self._search_page(obj, prop_names, min(100, end - offset), str(offset)),
+                    range(len(records), end, 100),
+                )
+                for page in pages:
+                    records.extend(page.get("results", []))
+            return records
+
         while len(records) < limit:
-            batch_size = min(100, limit - len(records))
-            payload: Dict[str, Any] = {"filterGroups": [], "properties": prop_names, "limit": batch_size}
-            if after:
-                payload["after"] = after
-            data = self._post(f"/crm/v3/objects/{obj}/search", payload)
+            data = self._search_page(obj, prop_names, min(100, limit - len(records)), after)
             batch = data.get("results", [])
             records.extend(batch)
             after = data.get("paging", {}).get("next", {}).get("after")
@@ -208,102 +374,149 @@ class HubSpotClient:
         except Exception:
             return []
 
-    def flatten(self, record: Dict) -> Dict:
-        flat = {"id": record.get("id", "")}
-        flat.update(record.get("properties", {}))
-        return flat
+
+# Authenticated clients are cached per AWS identity + secret path, so reruns
+# reuse the token and keep-alive session instead of re-authenticating. Tokens
+# that expire sooner are refreshed on the first 401.
+
+
+@st.cache_resource(ttl=1500, show_spinner=False)
+def get_hs_client(_sm, aws_identity: Tuple[str, str, str], secret_path: str, always_refresh: bool) -> HubSpotClient:
+    client = HubSpotClient(_sm, aws_identity)
+    client.load_secret(secret_path, always_refresh)
+    return client
 
 
 # ── Salesforce client ─────────────────────────────────────────────────────────
 
 
+SF_API_VERSION = "v59.0"
+# Subrequests per composite/batch call (Salesforce maximum)
+SF_BATCH_SIZE = 25
+# A batch runs its 25 COUNT() queries one after another, which on large objects
+# can take far longer than a single call, so it gets a longer read timeout
+SF_BATCH_TIMEOUT = (REQUEST_TIMEOUT[0], 120)
+# Field types left out of "all" queries: base64 holds whole file bodies, and
+# compound address/location values repeat their component fields as a nested dict
+SF_SKIP_FIELD_TYPES = ("base64", "address", "location")
+# Described field columns shown and exported by "shape"
+SF_SHAPE_COLUMNS = ("name", "label", "type", "length")
+# Salesforce rejects longer request URIs with HTTP 414
+SF_MAX_URI_LENGTH = 16384
+
+
 class SalesforceClient:
-    def __init__(self, boto_session: boto3.Session):
-        self.sm = boto_session.client("secretsmanager")
+    def __init__(self, sm, aws_identity: Tuple[str, str, str]):
+        self.sm = sm
+        self.aws_identity = aws_identity
         self.access_token: Optional[str] = None
         self.instance_url: Optional[str] = None
+        self._session = new_http_session()
+        self._creds: Optional[Dict] = None  # kept to fetch a new token on a 401
+        self._auth_lock = threading.Lock()
+        self._last_headers: Dict = {}
 
     def load_secret(self, secret_path: str, always_use_oauth: bool = True):
-        resp = self.sm.get_secret_value(SecretId=secret_path)
-        creds = json.loads(resp["SecretString"])
+        creds = _get_secret(self.sm, *self.aws_identity, secret_path)
         self.instance_url = creds.get("instance_url", "").rstrip("/")
         if not self.instance_url:
             raise ValueError("instance_url not found in credentials")
+        self._creds = creds
         if always_use_oauth:
             self.access_token = self._get_token(creds, force=True)
         else:
             self.access_token = creds.get("access_token") or self._get_token(creds)
+        self._session.headers["Authorization"] = f"Bearer {self.access_token}"
 
     def _get_token(self, creds: Dict, force: bool = False) -> str:
+        # Token requests never carry the session's (possibly stale) bearer header
         token_url = f"{self.instance_url}/services/oauth2/token"
 
         if "refresh_token" in creds:
             try:
-                r = requests.post(token_url, data={
+                r = self._session.post(token_url, data={
                     "grant_type": "refresh_token",
                     "client_id": creds["client_id"],
                     "client_secret": creds["client_secret"],
                     "refresh_token": creds["refresh_token"],
-                }, timeout=REQUEST_TIMEOUT)
+                }, headers={"Authorization": None}, timeout=REQUEST_TIMEOUT)
                 r.raise_for_status()
-                return r.json()["access_token"]
+                return json_loads(r.content)["access_token"]
             except Exception:
                 pass
 
         if "username" in creds and "password" in creds:
             try:
-                r = requests.post(token_url, data={
+                r = self._session.post(token_url, data={
                     "grant_type": "password",
                     "client_id": creds["client_id"],
                     "client_secret": creds["client_secret"],
                     "username": creds["username"],
                     "password": creds["password"] + creds.get("security_token", ""),
-                }, timeout=REQUEST_TIMEOUT)
+                }, headers={"Authorization": None}, timeout=REQUEST_TIMEOUT)
                 r.raise_for_status()
-                return r.json()["access_token"]
+                return json_loads(r.content)["access_token"]
             except Exception:
                 pass
 
-        r = requests.post(token_url, data={
+        r = self._session.post(token_url, data={
             "grant_type": "client_credentials",
             "client_id": creds["client_id"],
             "client_secret": creds["client_secret"],
-        }, timeout=REQUEST_TIMEOUT)
+        }, headers={"Authorization": None}, timeout=REQUEST_TIMEOUT)
+        r.raise_for_status()
+        return json_loads(r.content)["access_token"]
+
+    def _request_json(self, method: str, path: str, timeout=REQUEST_TIMEOUT, **kwargs) -> Dict:
+        """Call the versioned REST API at {path}; an expired token (401) is replaced once and the call retried."""
+        url = f"{self.instance_url}/services/data/{SF_API_VERSION}{path}"
+        token = self.access_token
+        r = self._session.request(method, url, timeout=timeout, **kwargs)
+        if r.status_code == 401 and self._creds:
+            with self._auth_lock:
+                if self.access_token == token:  # not already replaced by another thread
+                    self.access_token = self._get_token(self._creds, force=True)
+                    self._session.headers["Authorization"] = f"Bearer {self.access_token}"
+            r = self._session.request(method, url, timeout=timeout, **kwargs)
+        self._last_headers = r.headers
         r.raise_for_status()
-        return r.json()["access_token"]
+        return json_loads(r.content)
 
-    def _headers(self) -> Dict:
-        return {"Authorization": f"Bearer {self.access_token}", "Content-Type": "application/json"}
+    def pace_delay(self) -> float:
+        """Seconds to wait before the next discover batch.
+
+        Salesforce only reports daily usage (Sforce-Limit-Info: api-usage=used/max),
+        so batches go back to back until that nears SF_API_USAGE_THROTTLE.
+        """
+        info = self._last_headers.get("Sforce-Limit-Info", "")
+        try:
+            used, limit = info.split("api-usage=", 1)[1].split(",", 1)[0].split("/")
+            usage = int(used) / int(limit)
+        except (IndexError, ValueError, ZeroDivisionError):
+            return DISCOVER_DELAY
+        return DISCOVER_DELAY if usage >= SF_API_USAGE_THROTTLE else 0.0
+
+    def _get_json(self, path: str, params: Dict = None) -> Dict:
+        return self._request_json("GET", path, params=params)
 
     def query(self, soql: str) -> Dict:
-        r = requests.get(
-            f"{self.instance_url}/services/data/v59.0/query",
-            headers=self._headers(),
-            params={"q": soql},
-            timeout=REQUEST_TIMEOUT,
-        )
-        r.raise_for_status()
-        return r.json()
+        return self._get_json("/query", {"q": soql})
+
+    def fits_query_url(self, soql: str) -> bool:
+        """Whether `soql` can go in a GET /query string without hitting the URI limit."""
+        url = f"{self.instance_url}/services/data/{SF_API_VERSION}/query?{urlencode({'q': soql})}"
+        return len(url) <= SF_MAX_URI_LENGTH
 
     def get_objects(self) -> List[Dict]:
-        r = requests.get(
-            f"{self.instance_url}/services/data/v59.0/sobjects",
-            headers=self._headers(),
-            timeout=REQUEST_TIMEOUT,
-        )
-        r.raise_for_status()
-        return r.json().get("sobjects", [])
+        return self._get_json("/sobjects").get("sobjects", [])
 
     def describe(self, sobject: str) -> List[Dict]:
-        r = requests.get(
-            f"{self.instance_url}/services/data/v59.0/sobjects/{sobject}/describe",
-            headers=self._headers(),
-            timeout=REQUEST_TIMEOUT,
-        )
-        r.raise_for_status()
         return [
-            {"name": f["name"], "label": f["label"], "type": f["type"], "length": f["length"]}
-            for f in r.json().get("fields", [])
+            {
+                "name": f["name"], "label": f["label"], "type": f["type"], "length": f["length"],
+                "deprecatedAndHidden": f.get("deprecatedAndHidden", False),
+            }
+            for f in self._get_json(f"/sobjects/{sobject}/describe").get("fields", [])
         ]
 
     def count(self, sobject: str) -> int:
@@ -312,13 +525,165 @@ class SalesforceClient:
         except Exception:
             return -1
 
+    def count_batch(self, sobjects: List[str]) -> Dict[str, int]:
+        """COUNT() up to SF_BATCH_SIZE objects in one composite/batch call; -1 marks a failed count."""
+        payload = {"batchRequests": [
+            {"method": "GET", "url": f"{SF_API_VERSION}/query?{urlencode({'q': f'SELECT COUNT() FROM {s}'})}"}
+            for s in sobjects
+        ]}
+        counts = dict.fromkeys(sobjects, -1)
+        try:
+            results = self._request_json(
+                "POST", "/composite/batch",
+                data=json_dumps(payload), headers={"Content-Type": "application/json"},
+                timeout=SF_BATCH_TIMEOUT,
+            ).get("results", [])
+        except Exception:
+            return counts
+        for sobject, res in zip(sobjects, results):
+            if res.get("statusCode") == 200:
+                counts[sobject] = (res.get("result") or {}).get("totalSize", 0)
+        return counts
+
+
+@st.cache_resource(ttl=1500, show_spinner=False)
+def get_sf_client(_sm, aws_identity: Tuple[str, str, str], secret_path: str, always_use_oauth: bool) -> SalesforceClient:
+    client = SalesforceClient(_sm, aws_identity)
+    client.load_secret(secret_path, always_use_oauth)
+    return client
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def sf_describe(_client: SalesforceClient, aws_identity: Tuple[str, str, str], secret_path: str, sobject: str) -> List[Dict]:
+    """Field list for an sObject, kept for an hour per identity + org."""
+    return _client.describe(sobject)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def sf_objects(_client: SalesforceClient, aws_identity: Tuple[str, str, str], secret_path: str) -> List[Dict]:
+    """Global sObject list for discover, kept for an hour per identity + org."""
+    return _client.get_objects()
+
+
+# ── HubSpot query + rendering ─────────────────────────────────────────────────
+
+
+def freeze_filters(filters: Optional[List[Dict]]) -> Tuple:
+    """Canonical hashable form of search filters, so key order doesn't split the cache."""
+    return tuple(
+        tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in f.items()))
+        for f in filters or []
+    )
+
+
+def hs_frame(records: List[Dict]) -> pd.DataFrame:
+    """One row per record: id, then one column per property (built column-wise by pandas)."""
+    df = pd.DataFrame.from_records([r.get("properties", {}) for r in records])
+    df = df.drop(columns="id", errors="ignore")
+    df.insert(0, "id", [r.get("id", "") for r in records])
+    return df
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def hs_properties(_client: HubSpotClient, aws_identity: Tuple[str, str, str], secret_path: str, obj: str) -> List[Dict]:
+    """Property definitions for an object. Schemas change rarely, so they're kept for an hour."""
+    return _client.get_properties(obj)
+
+
+@st.cache_data(ttl=60, show_spinner="Querying HubSpot…")
+def hs_fetch(_client: HubSpotClient, aws_identity: Tuple[str, str, str], secret_path: str, obj: str,
+             qtype: str, limit: int, filters: Tuple, props: Tuple[str, ...]) -> Dict:
+    """Run a HubSpot query. Cached briefly so repeated runs don't re-page the API."""
+    if qtype == "count":
+        # Raise rather than return -1, so a failed count is shown as an error and not cached
+        return {"total": _client.total(obj)}
+
+    if qtype == "list":
+        records = _client.list_records(obj, list(props) or None, limit)
+        return {"rows": hs_frame(records)}
+
+    if qtype == "shape":
+        return {"rows": [
+            {"name": p["name"], "label": p["label"], "type": p["type"],
+             "fieldType": p["fieldType"], "group": p["groupName"]}
+            for p in hs_properties(_client, aws_identity, secret_path, obj)
+        ]}
+
+    if qtype == "all":
+        prop_names = list(props) or [p["name"] for p in hs_properties(_client, aws_identity, secret_path, obj)]
+        records = _client.fetch_all(obj, prop_names, limit)
+        return {"rows": hs_frame(records), "prop_count": len(prop_names)}
+
+    result = _client.search_records(obj, [dict(f) for f in filters], list(props) or None, limit)
+    records = result.get("results", [])
+    return {"rows": hs_frame(records), "total": result.get("total", len(records))}
+
+
+@st.cache_data(ttl=3600, show_spinner="Discovering HubSpot objects…")
+def hs_discover(_client: HubSpotClient, aws_identity: Tuple[str, str, str], secret_path: str, name_filter: str) -> List[Dict]:
+    """List standard + custom objects matching the filter, with record counts.
+
+    The custom schema list is fetched in the background while the matching
+    standard objects are already being counted.
+    """
+    term = name_filter.lower()
+
+    def matches(o: Dict) -> bool:
+        return not term or term in o["name"].lower() or term in o["label"].lower()
+
+    standard = [o for o in ({"name": n, "label": n.title(), "type": "standard"} for n in HUBSPOT_STANDARD_OBJECTS)
+                if matches(o)]
+
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        schemas = prefetch.submit(_client.get_schemas)
+        counts = dict(count_concurrently(_client.count, (o["name"] for o in standard), _client.pace_delay))
+        custom = [o for o in (
+            {
+                "name": s.get("fullyQualifiedName", s.get("name", "")),
+                "label": s.get("labels", {}).get("singular", s.get("name", "")),
+                "type": "custom",
+            }
+            for s in schemas.result()
+        ) if matches(o)]
+
+    counts.update(count_concurrently(_client.count, (o["name"] for o in custom), _client.pace_delay))
+    return [
+        {**obj, "record_count": counts[obj["name"]] if counts[obj["name"]] >= 0 else "Error"}
+        for obj in standard + custom
+    ]
+
+
+@st.fragment
+def render_hs_result(result: Dict, obj: str, qtype: str):
+    """Display a HubSpot result; widget clicks in here rerun only this fragment."""
+    if qtype == "count":
+        st.metric("Total records", f"{result['total']:,}")
+        return
+
+    rows = result["rows"]
+    if qtype == "list":
+        st.success(f"{len(rows)} records returned")
+    elif qtype == "shape":
+        st.success(f"{len(rows)} properties found")
+    elif qtype == "all":
+        st.success(f"{len(rows)} records, {result['prop_count']} properties")
+    else:
+        st.success(f"{result['total']:,} total matching — {len(rows)} returned")
+    st.dataframe(rows, width="stretch")
+
+    if qtype == "shape":
+        excel_download_button(make_excel(rows, "Object Shape"), f"{obj}_shape_{ts()}.xlsx")
+    elif qtype == "all":
+        excel_download_button(make_excel(rows, "Query Results"), f"{obj}_records_{ts()}.xlsx")
+
 
 # ── Main UI ───────────────────────────────────────────────────────────────────
 
 st.title("🔍 CRM Query Tools")
 
-session: Optional[boto3.Session] = st.session_state.get("aws_session")
-if not session:
+secrets_client = st.session_state.get("secrets_client")
+aws_identity: Tuple[str, str, str] = st.session_state.get("aws_identity")
+if not secrets_client:
     st.info("👈 Paste your AWS credentials in the sidebar to get started.")
     st.stop()
 
@@ -349,36 +714,10 @@ with tab_hs:
                 st.error("Enter a filter — searching all objects can exceed 2000 requests.")
             else:
                 try:
-                    client = HubSpotClient(session)
                     with st.spinner("Fetching credentials from AWS..."):
-                        client.load_secret(hs_secret, hs_refresh)
+                        client = get_hs_client(secrets_client, aws_identity, hs_secret, hs_refresh)
 
-                    with st.spinner("Fetching object schemas..."):
-                        schemas = client.get_schemas()
-
-                    all_objects = [{"name": o, "label": o.title(), "type": "standard"} for o in HUBSPOT_STANDARD_OBJECTS]
-                    for s in schemas:
-                        all_objects.append({
-                            "name": s.get("fullyQualifiedName", s.get("name", "")),
-                            "label": s.get("labels", {}).get("singular", s.get("name", "")),
-                            "type": "custom",
-                        })
-
-                    if hs_filter:
-                        term = hs_filter.lower()
-                        all_objects = [o for o in all_objects if term in o["name"].lower() or term in o["label"].lower()]
-
-                    st.info(f"{len(all_objects)} object(s) found — counting records...")
-                    rows = []
-                    prog = st.progress(0)
-                    status_text = st.empty()
-                    for i, obj in enumerate(all_objects):
-                        status_text.caption(f"({i + 1}/{len(all_objects)}) {obj['name']}")
-                        count = client.count(obj["name"])
-                        rows.append({**obj, "record_count": count if isinstance(count, int) and count >= 0 else "Error"})
-                        prog.progress((i + 1) / len(all_objects))
-                        time.sleep(DISCOVER_DELAY)
-                    status_text.empty()
+                    rows = hs_discover(client, client.aws_identity, hs_secret, hs_filter.strip())
 
                     st.success("Done")
                     st.dataframe(rows, width="stretch")
@@ -390,7 +729,7 @@ with tab_hs:
         HS_QTYPE_HELP = {
             "count":  "Returns the total number of records. No record data is fetched.",
             "list":   "Returns ID + default properties up to your limit. Fast and lightweight.",
-            "all":    "Fetches every property for every record up to your limit. Exports to Excel.",
+            "all":    "Fetches every property (or just the ones listed) for every record up to your limit. Exports to Excel.",
             "shape":  "Returns all property names, types, and labels — no record data. Exports to Excel.",
             "search": "Filters records using the JSON rules you define below. Returns matches up to your limit.",
         }
@@ -430,55 +769,15 @@ with tab_hs:
                 st.error("Fix the filter JSON before running.")
             else:
                 try:
-                    client = HubSpotClient(session)
                     with st.spinner("Fetching credentials from AWS..."):
-                        client.load_secret(hs_secret, hs_refresh)
+                        client = get_hs_client(secrets_client, aws_identity, hs_secret, hs_refresh)
 
                     props = [p.strip() for p in hs_props.split(",") if p.strip()] if hs_props else []
-
-                    if hs_qtype == "count":
-                        with st.spinner("Counting..."):
-                            total = client.count(hs_object)
-                        st.metric("Total records", f"{total:,}")
-
-                    elif hs_qtype == "list":
-                        with st.spinner("Fetching records..."):
-                            records = client.list_records(hs_object, props or None, hs_limit)
-                        flat = [client.flatten(r) for r in records]
-                        st.success(f"{len(flat)} records returned")
-                        st.dataframe(flat, width="stretch")
-
-                    elif hs_qtype == "shape":
-                        with st.spinner("Fetching properties..."):
-                            all_props = client.get_properties(hs_object)
-                        rows = [
-                            {"name": p["name"], "label": p["label"], "type": p["type"],
-                             "fieldType": p["fieldType"], "group": p["groupName"]}
-                            for p in all_props
-                        ]
-                        st.success(f"{len(rows)} properties found")
-                        st.dataframe(rows, width="stretch")
-                        excel_download_button(make_excel(rows, "Object Shape"), f"{hs_object}_shape_{ts()}.xlsx")
-
-                    elif hs_qtype == "all":
-                        with st.spinner("Fetching all properties..."):
-                            all_props = client.get_properties(hs_object)
-                        prop_names = [p["name"] for p in all_props]
-                        with st.spinner(f"Fetching up to {hs_limit} records ({len(prop_names)} properties)..."):
-                            records = client.fetch_all(hs_object, prop_names, hs_limit)
-                        flat = [client.flatten(r) for r in records]
-                        st.success(f"{len(flat)} records, {len(prop_names)} properties")
-                        st.dataframe(flat, width="stretch")
-                        excel_download_button(make_excel(flat, "Query Results"), f"{hs_object}_records_{ts()}.xlsx")
-
-                    elif hs_qtype == "search":
-                        with st.spinner("Searching..."):
-                            result = client.search_records(hs_object, hs_filters_parsed, props or None, hs_limit)
-                        records = result.get("results", [])
-                        total = result.get("total", len(records))
-                        flat = [client.flatten(r) for r in records]
-                        st.success(f"{total:,} total matching — {len(flat)} returned")
-                        st.dataframe(flat, width="stretch")
+                    result = hs_fetch(
+                        client, client.aws_identity, hs_secret, hs_object, hs_qtype,
+                        hs_limit, freeze_filters(hs_filters_parsed), tuple(props),
+                    )
+                    render_hs_result(result, hs_object, hs_qtype)
 
                 except Exception as exc:
                     st.error(f"Error: {exc}")
@@ -508,12 +807,11 @@ with tab_sf:
                 st.error("Enter a filter — searching all objects can exceed 2000 requests.")
             else:
                 try:
-                    client = SalesforceClient(session)
                     with st.spinner("Fetching credentials from AWS..."):
-                        client.load_secret(sf_secret, sf_oauth)
+                        client = get_sf_client(secrets_client, aws_identity, sf_secret, sf_oauth)
 
                     with st.spinner("Fetching Salesforce objects..."):
-                        all_objects = client.get_objects()
+                        all_objects = sf_objects(client, client.aws_identity, sf_secret)
 
                     if sf_filter:
                         term = sf_filter.lower()
@@ -523,16 +821,24 @@ with tab_sf:
                         ]
 
                     st.info(f"{len(all_objects)} object(s) found — counting records...")
-                    rows = []
+                    to_count = [o["name"] for o in all_objects if o.get("queryable", False)]
+                    counts = {}
                     prog = st.progress(0)
-                    status_text = st.empty()
-                    for i, obj in enumerate(all_objects):
+                    # One composite request per SF_BATCH_SIZE objects, and one
+                    # progress update (bar + label together) per request
+                    for i in range(0, len(to_count), SF_BATCH_SIZE):
+                        chunk = to_count[i:i + SF_BATCH_SIZE]
+                        counts.update(client.count_batch(chunk))
+                        prog.progress(len(counts) / len(to_count), text=f"{len(counts)}/{len(to_count)} counted")
+                        time.sleep(client.pace_delay())
+                    prog.empty()
+
+                    rows = []
+                    for obj in all_objects:
                         is_queryable = obj.get("queryable", False)
-                        status_text.caption(f"({i + 1}/{len(all_objects)}) {obj['name']}")
                         if is_queryable:
-                            count = client.count(obj["name"])
-                            record_count = count if isinstance(count, int) and count >= 0 else "Error"
-                            time.sleep(DISCOVER_DELAY)
+                            count = counts[obj["name"]]
+                            record_count = count if count >= 0 else "Error"
                         else:
                             record_count = "N/A"
                         rows.append({
@@ -541,8 +847,6 @@ with tab_sf:
                             "queryable": is_queryable,
                             "record_count": record_count,
                         })
-                        prog.progress((i + 1) / len(all_objects))
-                    status_text.empty()
 
                     st.success("Done")
                     st.dataframe(rows, width="stretch")
@@ -554,7 +858,7 @@ with tab_sf:
         SF_QTYPE_HELP = {
             "count":  "Runs SELECT COUNT() — returns total records only. No record data fetched.",
             "list":   "Returns Id + Name for up to 20 records. Quick overview.",
-            "all":    "Fetches all fields using FIELDS(ALL). Capped at 200 records by Salesforce. Exports to Excel.",
+            "all":    "Fetches every field (except binary file content) for up to 200 records. Exports to Excel.",
             "shape":  "Returns all field names, data types, and labels — no record data. Exports to Excel.",
             "custom": "Run any SOQL query you write. Full flexibility.",
         }
@@ -585,13 +889,15 @@ with tab_sf:
                 st.error("Enter a SOQL query.")
             else:
                 try:
-                    client = SalesforceClient(session)
                     with st.spinner("Fetching credentials from AWS..."):
-                        client.load_secret(sf_secret, sf_oauth)
+                        client = get_sf_client(secrets_client, aws_identity, sf_secret, sf_oauth)
 
                     if sf_qtype == "shape":
                         with st.spinner(f"Describing {sf_object}..."):
-                            fields = client.describe(sf_object)
+                            fields = [
+                                {k: f[k] for k in SF_SHAPE_COLUMNS}
+                                for f in sf_describe(client, client.aws_identity, sf_secret, sf_object)
+                            ]
                         st.success(f"{len(fields)} fields found")
                         st.dataframe(fields, width="stretch")
                         excel_download_button(make_excel(fields, "Object Shape"), f"{sf_object}_shape_{ts()}.xlsx")
@@ -604,7 +910,17 @@ with tab_sf:
                         elif sf_qtype == "list":
                             soql = f"SELECT Id, Name FROM {sf_object} LIMIT 20"
                         elif sf_qtype == "all":
-                            soql = f"SELECT FIELDS(ALL) FROM {sf_object} LIMIT {sf_limit}"
+                            # Explicit projection from the cached describe, minus base64 blobs, compound
+                            # fields and deprecated/hidden fields (which can't be selected)
+                            fields = sf_describe(client, client.aws_identity, sf_secret, sf_object)
+                            names = [
+                                f["name"] for f in fields
+                                if f["type"] not in SF_SKIP_FIELD_TYPES and not f.get("deprecatedAndHidden")
+                            ]
+                            soql = f"SELECT {', '.join(names)} FROM {sf_object} LIMIT {sf_limit}"
+                            if not client.fits_query_url(soql):
+                                # Too many fields to list in the URL; the limit is already capped at 200
+                                soql = f"SELECT FIELDS(ALL) FROM {sf_object} LIMIT {sf_limit}"
                         else:
                             soql = f"SELECT Id FROM {sf_object} LIMIT 10"
 
@@ -618,7 +934,7 @@ with tab_sf:
                             count_val = records[0]["expr0"] if records and "expr0" in records[0] else total
                             st.metric("Total records", f"{count_val:,}")
                         else:
-                            clean = [{k: v for k, v in r.items() if k != "attributes"} for r in records]
+                            clean = pd.DataFrame.from_records(records).drop(columns="attributes", errors="ignore")
                             st.success(f"{total:,} total — {len(clean)} returned")
                             st.dataframe(clean, width="stretch")
                             if sf_qtype in ("all", "custom"):
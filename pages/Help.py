@@ -1,11 +1,6 @@
 import streamlit as st
 
-st.title("❓ Help & Documentation")
-
-# ── Getting started ────────────────────────────────────────────────────────────
-
-st.header("Getting started")
-st.markdown("""
+GETTING_STARTED_MD = """
 Every session you need to provide fresh AWS credentials. This takes about 10 seconds.
 
 **Step 1** — Log in to AWS SSO (once per day, or when your session expires):
@@ -22,19 +17,9 @@ aws configure export-credentials --profile hook-production-tic
 **AWS Credentials** box in the sidebar on the main page.
 
 > Credentials typically last **8–12 hours**. If you get an auth error mid-session, repeat steps 1–2.
-""")
-
-st.divider()
+"""
 
-# ── Query types ────────────────────────────────────────────────────────────────
-
-st.header("Query types")
-
-col1, col2 = st.columns(2)
-
-with col1:
-    st.subheader("🟠 HubSpot")
-    st.markdown("""
+HUBSPOT_MD = """
 | Type | What it does |
 |------|-------------|
 | **count** | Returns the total number of records for the object |
@@ -58,16 +43,14 @@ quotes, calls, emails, meetings, notes, tasks, communications
 ]
 ```
 All filters in the list are ANDed together.
-    """)
+    """
 
-with col2:
-    st.subheader("🔵 Salesforce")
-    st.markdown("""
+SALESFORCE_MD = """
 | Type | What it does |
 |------|-------------|
 | **count** | `SELECT COUNT() FROM Object` — total record count |
 | **list** | `SELECT Id, Name FROM Object LIMIT 20` |
-| **all** | `SELECT FIELDS(ALL)` — every field, exports to Excel (max 200 records) |
+| **all** | `SELECT <every field>` — built from the object's describe, exports to Excel (max 200 records) |
 | **shape** | All field names, data types, and labels — exports to Excel |
 | **custom** | Write and run any SOQL query you like |
 
@@ -83,16 +66,13 @@ FROM Contact
 GROUP BY Account.Name
 ```
 
-> The **all** query type is capped at 200 records by Salesforce's `FIELDS(ALL)` limit.
+> The **all** query type is capped at 200 records and skips binary (base64) file-content fields.
+Compound address and location fields are left out too — their parts (street, city, latitude, …) are included as separate columns.
+Objects with so many fields that the list won't fit in a request URL are queried with `FIELDS(ALL)` instead, which includes them.
 For larger datasets use **custom** with explicit field names.
-    """)
-
-st.divider()
+    """
 
-# ── Discover mode ──────────────────────────────────────────────────────────────
-
-st.header("Discover mode")
-st.markdown("""
+DISCOVER_MD = """
 Available on both HubSpot and Salesforce tabs. Instead of querying a specific object,
 it lists **all available objects** with their record counts.
 
@@ -100,36 +80,34 @@ it lists **all available objects** with their record counts.
 - Leave the filter blank to list everything (can be slow on large orgs — use a filter when possible)
 - HubSpot discover shows standard objects + any custom schemas
 - Salesforce discover shows all sObjects; non-queryable ones show N/A instead of a count
-""")
-
-st.divider()
-
-# ── Rate limits ────────────────────────────────────────────────────────────────
+"""
 
-st.header("⚠️ Rate limit protections")
-st.markdown("""
+RATE_LIMIT_MD = """
 The tool has two built-in protections to avoid hammering customer APIs:
 
 **Request timeout — 10 seconds**
-Every outbound API call (to HubSpot, Salesforce, or AWS) times out after 10 seconds.
+Every outbound API call (to HubSpot, Salesforce, or AWS) times out after 10 seconds, and gives up
+after about 3 seconds if the server can't be reached at all. The exception is Salesforce discover's batched
+counts, which get 2 minutes because each batch runs 25 COUNT queries.
 If a call hangs due to a slow response or network issue, it fails cleanly rather than blocking forever.
-
-**Discover mode delay — 100ms between COUNT calls**
-When scanning objects in discover mode, the tool waits 100ms between each COUNT query.
+Rate-limit (429) and temporary server (5xx) errors are retried a few times with backoff before being shown.
+
+**Discover mode pacing — follows the API's rate-limit headers**
+HubSpot discover runs up to 4 COUNT queries at once and waits at least 200ms between starts, to stay
+under the search API's 5 requests a second. If HubSpot reports that search quota is running low it waits longer.
+HubSpot discover results (objects and counts) are cached for an hour, and HubSpot query results for a minute.
+Salesforce discover sends its counts 25 at a time in a single composite request, and pauses 100ms between
+batches once the org has used 90% of its daily API allowance.
+Its object list and field describes are cached for an hour; record counts are fetched fresh every time.
 This prevents firing hundreds of queries in a burst when a customer has many objects.
 
 **Tips to reduce API load:**
 - Always use the **filter box** in discover mode — counting 5 matching objects is much lighter than counting all 300
 - Use **count** before **all** to check the size of a dataset before pulling everything
 - Keep record limits reasonable — fetching 10,000 records on a wide object will be slow and expensive
-""")
-
-st.divider()
-
-# ── Common errors ──────────────────────────────────────────────────────────────
+"""
 
-st.header("🔴 Common errors")
-st.markdown("""
+ERRORS_MD = """
 | Error | Likely cause | Fix |
 |-------|-------------|-----|
 | `Invalid JSON` | Pasted credentials are malformed or incomplete | Re-run the export command and paste fresh |
@@ -139,4 +117,39 @@ st.markdown("""
 | `ExpiredTokenException` | Your AWS session has expired | Re-run `aws sso login` then `aws configure export-credentials` |
 | `Timeout` | An API call took longer than 10 seconds | Try again — if it keeps happening the customer's API may be having issues |
 | `ResourceNotFoundException` | The secret path doesn't exist in AWS Secrets Manager | Double-check the customer name spelling |
-""")
+"""
+
+st.title("❓ Help & Documentation")
+
+# ── Getting started ────────────────────────────────────────────────────────────
+
+with st.expander("Getting started", expanded=True):
+    st.markdown(GETTING_STARTED_MD)
+
+# ── Query types ────────────────────────────────────────────────────────────────
+
+with st.expander("Query types"):
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("🟠 HubSpot")
+        st.markdown(HUBSPOT_MD)
+
+    with col2:
+        st.subheader("🔵 Salesforce")
+        st.markdown(SALESFORCE_MD)
+
+# ── Discover mode ──────────────────────────────────────────────────────────────
+
+with st.expander("Discover mode"):
+    st.markdown(DISCOVER_MD)
+
+# ── Rate limits ────────────────────────────────────────────────────────────────
+
+with st.expander("⚠️ Rate limit protections"):
+    st.markdown(RATE_LIMIT_MD)
+
+# ── Common errors ──────────────────────────────────────────────────────────────
+
+with st.expander("🔴 Common errors"):
+    st.markdown(ERRORS_MD)
@@ -6,18 +6,46 @@ Fetches credentials from AWS Secrets Manager and queries Salesforce objects
 USAGE: Edit the CONFIG section below and run: python salesforce_query_tool.py
 """
 
+import csv
+import hashlib
+import io
 import json
 import boto3
 import requests
 import os
-from typing import Dict, Any
+import re
+import threading
+import time
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+from functools import lru_cache
+from itertools import chain, islice
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
+from email.utils import formatdate
+from urllib.parse import urlencode
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 from rich import print as rprint
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+# orjson parses wide query pages and secrets several times faster; fall back
+# to the stdlib when it isn't installed. json_dumps always returns bytes.
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
 
 # ============================================================================
 # CONFIGURATION - EDIT THIS SECTION 
@@ -33,6 +61,8 @@ CONFIG = {
 
     # Secret path in format: customer/integration
     # Example: 'conga/salesforce'
+    # Can also be a list of paths to run the same query against several customers,
+    # e.g. ['conga/salesforce', 'acme/salesforce'] -- secrets are fetched in one batch
     'secret_path': 'conga/salesforce',
 
     # Salesforce object to query
@@ -42,29 +72,56 @@ CONFIG = {
     # Query type: 'count', 'list', 'all', 'shape', or 'custom'
     # - 'count': Returns count of records
     # - 'list': Returns Id and Name fields (max 20 records)
-    # - 'all': Returns all fields (max 10 records) -- saves as .xlsx
+    # - 'all': Returns all fields (up to all_query_limit records) -- saves as .xlsx
     # - 'shape': Returns all column names and their data types for the object (no record data) -- saves as .xlsx
     # - 'custom': Use the custom_query below
     'query_type': 'all',
 
     # Limit for 'all' query type (if None or empty, defaults to 10)
-    # MAX 200 !!!
+    # The field list is built from describe, so this is not capped at 200
     'all_query_limit': 50,
 
+    # 'all' queries with a higher limit than this run as a Bulk API 2.0 job: one CSV
+    # download instead of a REST page per 2000 records (values are then exported as text)
+    'all_bulk_threshold': 10000,
+
+    # Longest to wait (seconds) for a Bulk API query job to finish before aborting it
+    'all_bulk_max_wait': 1800,
+
+    # Leave formula (calculated) fields out of 'all' queries -- they are computed
+    # per record by Salesforce and can make wide queries slow
+    'all_exclude_calculated_fields': False,
+
+    # Directory 'all' and 'shape' queries save their .xlsx file to (None = current directory)
+    # Checked before anything is fetched, so a bad path fails straight away
+    'save_directory': None,
+
     # Custom SOQL query (only used if query_type is 'custom')
     # Example: "SELECT Id, Name, Status FROM Asset WHERE Status = 'Active'"
     'custom_query': None,
 
     # Object discovery mode: set to True to list and search Salesforce objects
     # When True, set 'search_objects_filter' to search term (or None to list all)
+    # Separate several terms with '|' to match any of them, e.g. 'asset|account'
     'search_objects_mode': True,
     'search_objects_filter': 'opportuni',  # Example: 'asset', 'account', 'contact'
 
+    # Most count requests discover mode starts per minute, across all worker threads
+    # (each request counts up to 25 objects and uses one API call)
+    # Lower this for orgs that are close to their daily API allowance; 0 or None means no limit
+    'discover_rate_per_minute': 600,
+
+    # Don't COUNT system companion objects (sharing, field history, change events,
+    # feeds, tags), custom metadata types or deprecated objects in discover mode
+    # -- they are still listed, marked "Skipped"
+    'discover_skip_system_objects': False,
+
     # Auto-refresh credentials: If True, automatically refetch from AWS when token expires
     # This assumes your AWS secret is kept up-to-date with fresh credentials
     'auto_refresh_on_expire': True,
 
-    # Always use OAuth flow: If True, always generate fresh token via OAuth instead of using stored token
+    # Always use OAuth flow: If True, get the token via OAuth instead of using the stored access_token
+    # (a token minted by a run in the last hour is reused from ~/.cache; a rejected one is replaced once)
     # Recommended if your stored access_token in AWS Secrets Manager is often stale
     'always_use_oauth': True,
 
@@ -77,96 +134,472 @@ CONFIG = {
 
 console = Console()
 
+# Most secrets BatchGetSecretValue will return in one call
+SECRETS_BATCH_SIZE = 20
+
+# How long a decoded secret is reused before it is fetched from AWS again (seconds)
+SECRET_CACHE_TTL = 900
+
+# Concurrent count requests in search-objects mode
+COUNT_WORKERS = 8
+# COUNT() subrequests per composite/batch call (Salesforce maximum)
+COUNT_BATCH_SIZE = 25
+
+# (connect, read) timeouts in seconds: fail fast on an unreachable host while
+# giving slow SOQL queries room to finish
+SF_TIMEOUT = (3.05, 20)
+
+# A composite batch runs its COUNT() queries one after another, which on large
+# objects can take far longer than a single query
+COUNT_BATCH_TIMEOUT = (3.05, 120)
+
+# REST API version used for every data call
+SF_API_VERSION = 'v59.0'
+
+# Secrets Manager: short timeouts, adaptive retries for throttling
+AWS_CLIENT_CONFIG = Config(
+    connect_timeout=3,
+    read_timeout=5,
+    retries={'mode': 'adaptive', 'max_attempts': 4},
+)
+
+CACHE_DIR = os.path.expanduser('~/.cache/sfdc_query_tool')
+# Salesforce token responses carry no expiry; org session timeouts default to
+# two hours, so reuse an OAuth token for at most this long (seconds)...
+TOKEN_CACHE_TTL = 3600
+# ...and treat it as expired this many seconds early
+TOKEN_EXPIRY_MARGIN = 300
+
+# sObject API names are plain identifiers, so they can go into COUNT query URLs unquoted
+SOBJECT_NAME = re.compile(r'[A-Za-z0-9_]+').fullmatch
+
+# Suffixes of objects discover can skip counting: system companion objects, custom
+# objects' tag objects (__Tag), and custom metadata types (__mdt), which don't support
+# COUNT(). Standard tag objects (AccountTag, ...) are matched by their parent instead.
+SYSTEM_OBJECT_SUFFIXES = ('Share', 'History', 'ChangeEvent', 'Feed', '__Tag', '__mdt')
+
+# Bulk API 2.0 jobs: seconds between job status checks, and rows per result download
+BULK_POLL_INTERVAL = 2
+BULK_RESULT_RECORDS = 50000
+
+# Field types left out of 'all' queries: base64 holds whole file bodies, and
+# compound address/location values repeat their component fields as a nested dict
+SKIP_FIELD_TYPES = ('base64', 'address', 'location')
+
+# Salesforce rejects longer request URIs with HTTP 414; a wide object's explicit
+# field list can exceed this in a GET query string
+SF_MAX_URI_LENGTH = 16384
+
+# Most rows a FIELDS(ALL) query may return
+FIELDS_ALL_MAX_ROWS = 200
+
+# Described field → shape export row (Field Name, Data Type, Label, Length)
+FIELD_ROW = itemgetter('name', 'type', 'label', 'length')
+
+# Records buffered to size Excel columns before the rest stream to the sheet
+WIDTH_SAMPLE_ROWS = 100
+
+# Widest an exported Excel column is auto-sized to (characters)
+MAX_COLUMN_WIDTH = 50
+
+# Excel header styling, built once and shared by every export
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+
+# Error response bodies are cut to this many bytes before printing -- a failed
+# wide query can return a very large body
+ERROR_BODY_LIMIT = 512
+
+
+def _new_http_session() -> requests.Session:
+    """HTTP session that keeps the TLS connection to the Salesforce instance
+    alive across calls and retries transient 429/5xx responses with backoff."""
+    http = requests.Session()
+    http.mount('https://', HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET', 'POST'],
+            raise_on_status=False,
+        ),
+    ))
+    return http
+
+
+def _cache_path(key: str) -> str:
+    """Cache file for `key` (token, describe or object list), hashed so client ids and URLs never appear in filenames"""
+    return os.path.join(CACHE_DIR, f'{hashlib.sha1(key.encode()).hexdigest()}.json')
+
+
+def _credentials_user(credentials: Dict[str, Any]) -> str:
+    """Who the credentials run as: connected app plus refresh token or username.
+
+    Secrets for different integration users can share a connected app (and org),
+    so the client_id alone doesn't identify the user whose permissions apply.
+    """
+    user = credentials.get('refresh_token') or credentials.get('username') or ''
+    return f"{credentials.get('client_id')}:{user}"
+
+
+def _read_cache(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'rb') as f:
+            return json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path: str, obj: Dict):
+    """Write a cache file atomically (owner-only); caching is best-effort"""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json_dumps(obj))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _column_widths(headers: List[str], rows: List[List]) -> List[int]:
+    """Longest value per column (header included), measured in one column-wise
+    pass that stops as soon as a column reaches the MAX_COLUMN_WIDTH cap"""
+    full = MAX_COLUMN_WIDTH - 2
+    widths = []
+    for header, column in zip(headers, list(zip(*rows)) or [()] * len(headers)):
+        width = len(str(header))
+        for value in column:
+            if width >= full:
+                break
+            if value is not None:
+                length = len(value) if isinstance(value, str) else len(str(value))
+                if length > width:
+                    width = length
+        widths.append(width)
+    return widths
+
+
+@lru_cache(maxsize=None)
+def _filter_matcher(search_filter: str):
+    """Case-insensitive substring match for any of the '|'-separated terms, compiled once"""
+    terms = [term.strip() for term in search_filter.split('|') if term.strip()]
+    return re.compile('|'.join(map(re.escape, terms)), re.IGNORECASE).search
+
+
+def _print_request_error(message: str, e: Exception):
+    """Print a failed call's error, plus the start of the API's response body when there is one"""
+    console.print(f"[red]{message}: {str(e)}[/red]")
+    response = getattr(e, 'response', None)
+    if response is not None:
+        body = response.content[:ERROR_BODY_LIMIT].decode('utf-8', 'replace')
+        console.print(f"Response: {body}", style="red", markup=False)
+
+
+@lru_cache(maxsize=None)
+def _api_base(instance_url: str) -> str:
+    """REST API base URL for an instance, normalised once per org"""
+    return f"{instance_url.rstrip('/')}/services/data/{SF_API_VERSION}"
+
+
+def _all_fields_query(instance_url: str, sobject: str, names: List[str], limit: int,
+                      bulk_threshold: Optional[int]) -> Tuple[str, bool]:
+    """SOQL for an 'all' query and whether to run it as a Bulk API 2.0 job.
+
+    The explicit field list goes in the GET query string, so if it would make
+    the URI too long, up to FIELDS_ALL_MAX_ROWS rows fall back to FIELDS(ALL)
+    and larger limits go to Bulk, which takes the query in a POST body.
+    """
+    soql = f"SELECT {', '.join(names)} FROM {sobject} LIMIT {limit}"
+    if limit > (bulk_threshold or limit):
+        return soql, True
+    if len(f"{_api_base(instance_url)}/query?{urlencode({'q': soql})}") <= SF_MAX_URI_LENGTH:
+        return soql, False
+    if limit <= FIELDS_ALL_MAX_ROWS:
+        return f"SELECT FIELDS(ALL) FROM {sobject} LIMIT {limit}", False
+    return soql, True
+
+
+def _is_system_object(name: str, object_names: set) -> bool:
+    """Whether discover can skip counting `name`; a bare 'Tag' suffix only counts
+    when the rest is itself an object (AccountTag, not PriceTag)"""
+    return name.endswith(SYSTEM_OBJECT_SUFFIXES) or (name.endswith('Tag') and name[:-3] in object_names)
+
+
+class RateLimiter:
+    """Spaces calls evenly at `per_minute` starts per minute across threads.
+
+    Each caller reserves the next start slot under the lock and sleeps
+    outside it, so time already spent on a request counts towards the gap.
+    A `per_minute` of 0 or None means no limit.
+    """
+
+    def __init__(self, per_minute: Optional[int]):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_ok = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_ok)
+            self.next_ok = start + self.interval
+        time.sleep(start - now)
+
 
 class SalesforceQueryTool:
-    def __init__(self, profile: str, region: str):
+    def __init__(self, profile: str, region: str, http: Optional[requests.Session] = None):
         self.profile = profile
         self.region = region
         self.session = boto3.Session(profile_name=profile, region_name=region)
-        self.secrets_client = self.session.client('secretsmanager')
+        self.secrets_client = self.session.client('secretsmanager', config=AWS_CLIENT_CONFIG)
+        # Every Salesforce call goes through this one pooled session; pass your own
+        # (e.g. with a mocked adapter) to intercept them
+        self.http = http or _new_http_session()
+        self._describes: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        # secret name -> (expires_at, decoded secret); guarded by the lock,
+        # which is never held across a call to AWS
+        self.secrets: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._secrets_lock = threading.Lock()
+
+    def close(self):
+        """Release the pooled Salesforce connections"""
+        self.http.close()
+
+    def _cached_secret(self, secret_name: str) -> Optional[Dict[str, Any]]:
+        """Return a cached secret if it has not expired"""
+        with self._secrets_lock:
+            entry = self.secrets.get(secret_name)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            self.secrets.pop(secret_name, None)
+            return None
+
+    def _store_secret(self, secret_name: str, credentials: Dict[str, Any]):
+        """Cache a decoded secret for SECRET_CACHE_TTL seconds"""
+        with self._secrets_lock:
+            self.secrets[secret_name] = (time.monotonic() + SECRET_CACHE_TTL, credentials)
 
     def get_secret(self, secret_name: str, force_refresh: bool = False) -> Dict[str, Any]:
         """Fetch secret from AWS Secrets Manager"""
-        try:
-            console.print(f"[cyan]Fetching secret: {secret_name}[/cyan]")
-            response = self.secrets_client.get_secret_value(SecretId=secret_name)
-            secret_string = response['SecretString']
-            credentials = json.loads(secret_string)
+        if not force_refresh:
+            credentials = self._cached_secret(secret_name)
+            if credentials is not None:
+                return credentials
 
-            # If force_refresh is True, fetch fresh credentials again
+        try:
             if force_refresh:
                 console.print(f"[yellow]Refreshing credentials from AWS...[/yellow]")
-                response = self.secrets_client.get_secret_value(SecretId=secret_name)
-                secret_string = response['SecretString']
-                credentials = json.loads(secret_string)
+            else:
+                console.print(f"[cyan]Fetching secret: {secret_name}[/cyan]")
+            response = self.secrets_client.get_secret_value(SecretId=secret_name)
+            secret_string = response['SecretString']
+            credentials = json_loads(secret_string)
 
+            self._store_secret(secret_name, credentials)
             return credentials
         except Exception as e:
             console.print(f"[red]Error fetching secret: {str(e)}[/red]")
             raise
 
-    def get_salesforce_objects(self, instance_url: str, access_token: str) -> list:
-        """Get list of all Salesforce objects"""
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
+    def get_secrets(self, secret_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch several secrets from AWS Secrets Manager, up to 20 per call"""
+        found = {}
+        missing = []
+        for name in dict.fromkeys(secret_names):
+            credentials = self._cached_secret(name)
+            if credentials is None:
+                missing.append(name)
+            else:
+                found[name] = credentials
 
-        instance_url = instance_url.rstrip('/')
-        sobjects_url = f"{instance_url}/services/data/v59.0/sobjects"
+        console.print(f"[cyan]Fetching {len(missing)} secret(s) in batches of {SECRETS_BATCH_SIZE}[/cyan]")
+
+        for start in range(0, len(missing), SECRETS_BATCH_SIZE):
+            chunk = missing[start:start + SECRETS_BATCH_SIZE]
+            try:
+                response = self.secrets_client.batch_get_secret_value(SecretIdList=chunk)
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'AccessDeniedException':
+                    raise
+                # Older IAM policies only grant GetSecretValue -- fetch one at a time
+                console.print("[yellow]BatchGetSecretValue not permitted, fetching secrets individually[/yellow]")
+                for name in missing[start:]:
+                    found[name] = self.get_secret(name)
+                break
+
+            for secret in response.get('SecretValues', []):
+                credentials = json_loads(secret['SecretString'])
+                self._store_secret(secret['Name'], credentials)
+                found[secret['Name']] = credentials
+            for error in response.get('Errors', []):
+                console.print(f"[red]Error fetching secret {error['SecretId']}: {error['Message']}[/red]")
+
+        return found
+
+    def _get_metadata(self, url: str, access_token: str, cache_key: str, extract) -> Any:
+        """GET a metadata resource, revalidating the copy cached on disk by an earlier run.
+
+        Sends If-None-Match (the stored ETag) and If-Modified-Since; on a 304 the
+        cached data is reused. `extract` trims the JSON body to what is kept.
+        """
+        headers = self._auth_headers(access_token)
+        cache_file = _cache_path(cache_key)
+        cached = _read_cache(cache_file)
+        if cached and 'data' in cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            headers['If-Modified-Since'] = formatdate(cached['fetched_at'], usegmt=True)
+        else:
+            cached = None
+
+        fetched_at = time.time()
+        response = self.http.get(url, headers=headers, timeout=SF_TIMEOUT)
+        response.raise_for_status()
+        if response.status_code == 304 and cached:
+            return cached['data']
+
+        data = extract(json_loads(response.content))
+        _write_cache(cache_file, {'fetched_at': fetched_at, 'etag': response.headers.get('ETag'), 'data': data})
+        return data
+
+    def get_salesforce_objects(self, instance_url: str, access_token: str, user: str = '') -> list:
+        """Get list of all Salesforce objects (cached on disk per user and revalidated, like describes)"""
+        sobjects_url = f"{_api_base(instance_url)}/sobjects"
 
         try:
             console.print("[cyan]Fetching all Salesforce objects...[/cyan]")
-            response = requests.get(sobjects_url, headers=headers)
-            response.raise_for_status()
-            return response.json().get('sobjects', [])
+            return self._get_metadata(
+                sobjects_url, access_token, f"sobjects:{user}@{instance_url.rstrip('/')}",
+                lambda data: [
+                    {
+                        'name': o['name'], 'label': o.get('label', ''),
+                        'queryable': o.get('queryable', False),
+                        'deprecatedAndHidden': o.get('deprecatedAndHidden', False),
+                    }
+                    for o in data.get('sobjects', [])
+                ],
+            )
         except Exception as e:
-            console.print(f"[red]Error fetching Salesforce objects: {str(e)}[/red]")
-            if hasattr(e, 'response') and e.response is not None:
-                console.print(f"[red]Response: {e.response.text}[/red]")
+            _print_request_error("Error fetching Salesforce objects", e)
             raise
 
-    def describe_sobject(self, instance_url: str, access_token: str, sobject: str) -> list:
-        """Describe a Salesforce object to get all field names and data types"""
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
+    def describe_sobject(self, instance_url: str, access_token: str, sobject: str, user: str = '') -> list:
+        """Describe a Salesforce object to get all field names and data types.
 
-        instance_url = instance_url.rstrip('/')
-        describe_url = f"{instance_url}/services/data/v59.0/sobjects/{sobject}/describe"
+        Kept for the rest of the run, and on disk between runs: a warm start
+        revalidates with the stored ETag and reuses the cached fields on a 304.
+        Cached per `user` (see _credentials_user), as the visible fields depend
+        on that user's permissions.
+        """
+        api_base = _api_base(instance_url)
+        key = (user, api_base, sobject)
+        if key in self._describes:
+            return self._describes[key]
+
+        describe_url = f"{api_base}/sobjects/{sobject}/describe"
 
         try:
             console.print(f"[cyan]Describing object: {sobject}[/cyan]")
-            response = requests.get(describe_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            fields = data.get('fields', [])
-            return [{'name': f['name'], 'type': f['type'], 'label': f['label'], 'length': f['length']} for f in fields]
+            self._describes[key] = self._get_metadata(
+                describe_url, access_token, f"describe:{user}@{instance_url.rstrip('/')}:{sobject}",
+                lambda data: [
+                    {
+                        'name': f['name'], 'type': f['type'], 'label': f['label'], 'length': f['length'],
+                        'calculated': f.get('calculated', False),
+                        'deprecatedAndHidden': f.get('deprecatedAndHidden', False),
+                    }
+                    for f in data.get('fields', [])
+                ],
+            )
+            return self._describes[key]
         except Exception as e:
-            console.print(f"[red]Error describing Salesforce object: {str(e)}[/red]")
-            if hasattr(e, 'response') and e.response is not None:
-                console.print(f"[red]Response: {e.response.text}[/red]")
+            _print_request_error("Error describing Salesforce object", e)
             raise
 
-    def count_records(self, instance_url: str, access_token: str, sobject: str) -> int:
-        """Count records in a Salesforce object"""
+    def _auth_headers(self, access_token: str) -> Dict[str, str]:
+        return {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        }
+
+    def count_records_batch(self, instance_url: str, access_token: str, sobjects: List[str]) -> Dict[str, int]:
+        """COUNT() up to COUNT_BATCH_SIZE objects in one composite/batch call; -1 marks a failed count"""
+        counts = dict.fromkeys(sobjects, -1)
+        valid = [sobject for sobject in sobjects if SOBJECT_NAME(sobject)]
+        if not valid:
+            return counts
+
+        payload = {'batchRequests': [
+            {'method': 'GET', 'url': f"{SF_API_VERSION}/query?q=SELECT+COUNT()+FROM+{sobject}"} for sobject in valid
+        ]}
+        batch_url = f"{_api_base(instance_url)}/composite/batch"
+
         try:
-            query = f"SELECT COUNT() FROM {sobject}"
-            result = self.query_salesforce(instance_url, access_token, query, silent=True)
-            return result.get('totalSize', 0)
+            response = self.http.post(batch_url, headers=self._auth_headers(access_token),
+                                      data=json_dumps(payload), timeout=COUNT_BATCH_TIMEOUT)
+            response.raise_for_status()
+            results = json_loads(response.content).get('results', [])
         except Exception:
-            # Silently return -1 for errors during bulk counting
-            return -1  # Return -1 to indicate error
-
-    def get_salesforce_access_token(self, credentials: Dict[str, Any], force_refresh: bool = False) -> str:
-        """Get access token using OAuth credentials"""
+            # Silently leave the whole batch at -1 during bulk counting
+            return counts
+
+        for sobject, result in zip(valid, results):
+            if result.get('statusCode') == 200:
+                counts[sobject] = (result.get('result') or {}).get('totalSize', 0)
+        return counts
+
+    def _load_cached_token(self, key: str) -> Optional[str]:
+        """Return a token minted by an earlier run if it is still fresh, else None"""
+        cached = _read_cache(_cache_path(key))
+        if cached and cached.get('expires_at', 0) - TOKEN_EXPIRY_MARGIN > time.time():
+            return cached.get('access_token')
+        return None
+
+    def _save_cached_token(self, key: str, token: str):
+        _write_cache(_cache_path(key), {'access_token': token, 'expires_at': time.time() + TOKEN_CACHE_TTL})
+
+    def get_salesforce_access_token(self, credentials: Dict[str, Any], force_refresh: bool = False,
+                                    use_cache: bool = True) -> str:
+        """Get access token using OAuth credentials, reusing one cached on disk by a recent run"""
         # Check if access_token is already in the secret and we're not forcing refresh
         if 'access_token' in credentials and not force_refresh:
             return credentials['access_token']
 
-        instance_url = credentials.get('instance_url', 'https://login.salesforce.com')
-        token_url = f"{instance_url.rstrip('/')}/services/oauth2/token"
+        instance_url = credentials.get('instance_url', 'https://login.salesforce.com').rstrip('/')
+        token_url = f"{instance_url}/services/oauth2/token"
+
+        cache_key = f"token:{_credentials_user(credentials)}@{instance_url}"
+        if use_cache:
+            token = self._load_cached_token(cache_key)
+            if token:
+                console.print("[green]✓ Using cached access token[/green]")
+                return token
+
+        token = self._request_access_token(credentials, token_url)
+        self._save_cached_token(cache_key, token)
+        return token
+
+    def _call_with_reauth(self, credentials: Dict[str, Any], access_token: str, call):
+        """Run `call(access_token)`; if Salesforce rejects the token (it may be a cached
+        one that was since revoked), mint a fresh one and retry once.
+
+        Returns the result and the token that was accepted.
+        """
+        try:
+            return call(access_token), access_token
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or e.response.status_code != 401:
+                raise
+            console.print("[yellow]Access token rejected, generating a fresh token...[/yellow]")
+            access_token = self.get_salesforce_access_token(credentials, force_refresh=True, use_cache=False)
+            return call(access_token), access_token
+
+    def _request_access_token(self, credentials: Dict[str, Any], token_url: str) -> str:
+        """Run the OAuth flows the credentials support, returning the first token issued"""
 
         # Try refresh token flow first if available
         if 'refresh_token' in credentials:
@@ -179,9 +612,9 @@ class SalesforceQueryTool:
             }
 
             try:
-                response = requests.post(token_url, data=data)
+                response = self.http.post(token_url, data=data, timeout=SF_TIMEOUT)
                 response.raise_for_status()
-                new_token = response.json()['access_token']
+                new_token = json_loads(response.content)['access_token']
                 console.print("[green]✓ Successfully refreshed access token[/green]")
                 return new_token
             except Exception as e:
@@ -203,9 +636,9 @@ class SalesforceQueryTool:
                 data['password'] = credentials['password'] + credentials['security_token']
 
             try:
-                response = requests.post(token_url, data=data)
+                response = self.http.post(token_url, data=data, timeout=SF_TIMEOUT)
                 response.raise_for_status()
-                new_token = response.json()['access_token']
+                new_token = json_loads(response.content)['access_token']
                 console.print("[green]✓ Successfully authenticated with password[/green]")
                 return new_token
             except Exception as e:
@@ -220,89 +653,168 @@ class SalesforceQueryTool:
         }
 
         try:
-            response = requests.post(token_url, data=data)
+            response = self.http.post(token_url, data=data, timeout=SF_TIMEOUT)
             response.raise_for_status()
-            return response.json()['access_token']
+            return json_loads(response.content)['access_token']
         except Exception as e:
-            console.print(f"[red]Error getting access token: {str(e)}[/red]")
-            if hasattr(e, 'response') and e.response is not None:
-                console.print(f"[red]Response: {e.response.text}[/red]")
+            _print_request_error("Error getting access token", e)
             raise
 
     def query_salesforce(self, instance_url: str, access_token: str, soql_query: str, silent: bool = False) -> Dict[str, Any]:
         """Execute SOQL query against Salesforce"""
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-
-        # Ensure instance_url doesn't have trailing slash
-        instance_url = instance_url.rstrip('/')
-
-        query_url = f"{instance_url}/services/data/v59.0/query"
+        headers = self._auth_headers(access_token)
+        query_url = f"{_api_base(instance_url)}/query"
 
         try:
             if not silent:
                 console.print(f"[cyan]Executing query: {soql_query}[/cyan]")
-            response = requests.get(query_url, headers=headers, params={'q': soql_query})
+            response = self.http.get(query_url, headers=headers, params={'q': soql_query}, timeout=SF_TIMEOUT)
             response.raise_for_status()
-            return response.json()
+            return json_loads(response.content)
         except Exception as e:
             if not silent:
-                console.print(f"[red]Error querying Salesforce: {str(e)}[/red]")
-                if hasattr(e, 'response') and e.response is not None:
-                    console.print(f"[red]Response: {e.response.text}[/red]")
+                _print_request_error("Error querying Salesforce", e)
+            raise
+
+    def iter_records(self, instance_url: str, access_token: str, results: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Yield the records of a query result, fetching later pages via nextRecordsUrl as they are consumed"""
+        headers = self._auth_headers(access_token)
+        instance_url = instance_url.rstrip('/')
+
+        while True:
+            yield from results.get('records', [])
+            next_url = results.get('nextRecordsUrl')
+            if not next_url:
+                return
+            response = self.http.get(f"{instance_url}{next_url}", headers=headers, timeout=SF_TIMEOUT)
+            response.raise_for_status()
+            results = json_loads(response.content)
+
+    def _write_workbook(self, sheet_title: str, headers: List[str], rows: Iterable[List], filepath: str,
+                        widths: List[int] = None):
+        """Stream header + rows into a write-only workbook and save it.
+
+        Write-only sheets need column widths before the first row is appended.
+        Pass the max value length per column as `widths` if the caller already
+        measured it; otherwise `rows` must be a list and is measured here.
+        """
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(sheet_title)
+
+        if widths is None:
+            widths = _column_widths(headers, rows)
+        for col_idx, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = min(width + 2, MAX_COLUMN_WIDTH)
+
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        for row in rows:
+            ws.append(row)
+
+        wb.save(filepath)
+
+    def bulk_query_records(self, instance_url: str, access_token: str, soql_query: str,
+                           max_wait: float = 1800) -> Iterator[Dict[str, Any]]:
+        """Run a query as a Bulk API 2.0 job and return an iterator of its CSV result rows as records.
+
+        Creating the job and waiting for it happen here, so an auth error is
+        raised straight away. A job still running after `max_wait` seconds, or
+        when the wait is interrupted, is aborted so it doesn't keep running
+        server-side. Rows then stream from the download as they are consumed.
+        Empty cells come back as None, like nulls in REST results; everything
+        else is a string.
+        """
+        headers = self._auth_headers(access_token)
+        jobs_url = f"{_api_base(instance_url)}/jobs/query"
+
+        job = {'operation': 'query', 'query': soql_query, 'contentType': 'CSV', 'lineEnding': 'LF'}
+        response = self.http.post(jobs_url, headers=headers, data=json_dumps(job), timeout=SF_TIMEOUT)
+        response.raise_for_status()
+        job_url = f"{jobs_url}/{json_loads(response.content)['id']}"
+
+        deadline = time.monotonic() + max_wait
+        try:
+            while True:
+                response = self.http.get(job_url, headers=headers, timeout=SF_TIMEOUT)
+                response.raise_for_status()
+                job = json_loads(response.content)
+                if job['state'] == 'JobComplete':
+                    break
+                if job['state'] in ('Failed', 'Aborted'):
+                    raise RuntimeError(f"Bulk query job {job['state'].lower()}: {job.get('errorMessage', '')}")
+                if time.monotonic() >= deadline:
+                    self._abort_bulk_job(job_url, headers)
+                    raise TimeoutError(f"Bulk query job still {job['state']} after {max_wait:.0f}s; aborted it")
+                time.sleep(BULK_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            self._abort_bulk_job(job_url, headers)
             raise
 
-    def save_to_excel(self, results: Dict[str, Any], query: str, save_directory: str, sobject: str) -> str:
-        """Save query results to Excel file"""
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Query Results"
+        return self._iter_bulk_results(job_url, headers)
+
+    def _abort_bulk_job(self, job_url: str, headers: Dict[str, str]):
+        """Ask Salesforce to stop a query job; best-effort, as we are already giving up on it"""
+        try:
+            self.http.patch(job_url, headers=headers, data=json_dumps({'state': 'Aborted'}), timeout=SF_TIMEOUT)
+        except requests.exceptions.RequestException:
+            pass
+
+    def _iter_bulk_results(self, job_url: str, headers: Dict[str, str]) -> Iterator[Dict[str, Any]]:
+        # Results come in chunks; Sforce-Locator points at the next one until it is 'null'
+        locator = None
+        while True:
+            params = {'maxRecords': BULK_RESULT_RECORDS}
+            if locator:
+                params['locator'] = locator
+            with self.http.get(f"{job_url}/results", headers=headers, params=params,
+                               stream=True, timeout=SF_TIMEOUT) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                for row in csv.DictReader(io.TextIOWrapper(response.raw, encoding='utf-8', newline='')):
+                    yield {k: v or None for k, v in row.items()}
+                locator = response.headers.get('Sforce-Locator')
+            if not locator or locator == 'null':
+                return
 
+    def save_to_excel(self, records: Iterable[Dict[str, Any]], query: str, save_directory: str,
+                      sobject: str) -> Tuple[Optional[str], int]:
+        """Save query results to Excel file, returning the path and number of records written"""
         # Get records
-        records = results.get('records', [])
-        if not records:
+        records = iter(records)
+        first = next(records, None)
+        if first is None:
             console.print("[yellow]No records to save[/yellow]")
-            return None
+            return None, 0
+
+        # Every record from one SOQL query has the same fields (excluding attributes)
+        all_fields = sorted(k for k in first.keys() if k != 'attributes')
+
+        # One C-level lookup of every column per record; SOQL JSON includes every
+        # selected field (null or not), so the keys are always present
+        values = itemgetter(*all_fields) if len(all_fields) > 1 else (lambda r: (r[all_fields[0]],))
+
+        def to_row(record: Dict[str, Any]) -> List:
+            # Handle nested objects/dicts (compound address/location fields, relationships)
+            return [str(v) if isinstance(v, dict) else v for v in values(record)]
+
+        # Size columns from the first WIDTH_SAMPLE_ROWS records; the rest stream straight to disk
+        head = [to_row(record) for record in chain([first], islice(records, WIDTH_SAMPLE_ROWS - 1))]
+        widths = _column_widths(all_fields, head)
 
-        # Get all unique fields (excluding attributes)
-        all_fields = set()
-        for record in records:
-            all_fields.update(k for k in record.keys() if k != 'attributes')
-        all_fields = sorted(all_fields)
-
-        # Write header row with styling
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-
-        for col_idx, field in enumerate(all_fields, 1):
-            cell = ws.cell(row=1, column=col_idx, value=field)
-            cell.fill = header_fill
-            cell.font = header_font
-
-        # Write data rows
-        for row_idx, record in enumerate(records, 2):
-            for col_idx, field in enumerate(all_fields, 1):
-                value = record.get(field, '')
-                # Handle nested objects/dicts
-                if isinstance(value, dict):
-                    value = str(value)
-                ws.cell(row=row_idx, column=col_idx, value=value)
-
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-            ws.column_dimensions[column_letter].width = adjusted_width
+        count = len(head)
+
+        def rows():
+            nonlocal count
+            yield from head
+            for record in records:
+                count += 1
+                yield to_row(record)
 
         # Generate filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -310,55 +822,24 @@ class SalesforceQueryTool:
         filepath = os.path.join(save_directory, filename)
 
         # Save file
-        wb.save(filepath)
-        return filepath
+        self._write_workbook("Query Results", all_fields, rows(), filepath, widths)
+        return filepath, count
 
     def save_shape_to_excel(self, fields: list, save_directory: str, sobject: str) -> str:
         """Save object shape (field names and types) to Excel file"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Object Shape"
-
         if not fields:
             console.print("[yellow]No fields found[/yellow]")
             return None
 
-        # Write header row with styling
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-
         headers = ['Field Name', 'Data Type', 'Label', 'Length']
-        for col_idx, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-
-        # Write data rows
-        for row_idx, field in enumerate(fields, 2):
-            ws.cell(row=row_idx, column=1, value=field['name'])
-            ws.cell(row=row_idx, column=2, value=field['type'])
-            ws.cell(row=row_idx, column=3, value=field['label'])
-            ws.cell(row=row_idx, column=4, value=field['length'])
-
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+        rows = list(map(FIELD_ROW, fields))
 
         # Generate filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{sobject}_shape_{timestamp}.xlsx"
         filepath = os.path.join(save_directory, filename)
 
-        wb.save(filepath)
+        self._write_workbook("Object Shape", headers, rows, filepath)
         return filepath
 
     def display_results(self, results: Dict[str, Any], query: str):
@@ -385,19 +866,19 @@ class SalesforceQueryTool:
                 # Create table with fields from first record
                 table = Table(title="Query Results", show_lines=True)
 
-                # Get all unique fields (excluding attributes)
-                all_fields = set()
-                for record in records:
-                    all_fields.update(k for k in record.keys() if k != 'attributes')
+                # Only the displayed rows (first 20, for readability) are scanned,
+                # and their fields (excluding attributes) sorted once
+                display_count = min(20, len(records))
+                displayed = records[:display_count]
+                sorted_fields = sorted({k for record in displayed for k in record if k != 'attributes'})
 
                 # Add columns
-                for field in sorted(all_fields):
+                for field in sorted_fields:
                     table.add_column(field, style="cyan")
 
-                # Add rows (limit to first 20 for readability)
-                display_count = min(20, len(records))
-                for record in records[:display_count]:
-                    row = [str(record.get(field, '')) for field in sorted(all_fields)]
+                # Add rows
+                for record in displayed:
+                    row = [str(record.get(field, '')) for field in sorted_fields]
                     table.add_row(*row)
 
                 console.print(table)
@@ -411,19 +892,8 @@ class SalesforceQueryTool:
                   auto_refresh: bool = True, always_use_oauth: bool = False, save_directory: str = None):
         """Main execution flow for querying"""
         try:
-            # If query type is 'all' or 'shape' and no save directory provided, ask for it
             if query_type.lower() in ('all', 'shape') and not save_directory:
-                console.print("[yellow]Query type 'all' or 'shape' will export results to Excel file.[/yellow]")
-                save_directory = input("Enter directory path to save Excel file (or press Enter for current directory): ").strip()
-                if not save_directory:
-                    save_directory = os.getcwd()
-
-                # Validate directory exists
-                if not os.path.isdir(save_directory):
-                    console.print(f"[red]Error: Directory does not exist: {save_directory}[/red]")
-                    return
-
-                console.print(f"[green]Will save to: {save_directory}[/green]\n")
+                save_directory = os.getcwd()
 
             # Display configuration
             config_table = Table(title="Current Configuration", show_header=False)
@@ -462,10 +932,12 @@ class SalesforceQueryTool:
             instance_url = credentials.get('instance_url')
             if not instance_url:
                 raise ValueError("instance_url not found in credentials")
+            # Metadata caches are per secret and user: what describe returns depends on their permissions
+            user = f"{secret_path}:{_credentials_user(credentials)}"
 
             # Get access token
             if always_use_oauth:
-                console.print("[cyan]Generating fresh access token via OAuth flow...[/cyan]")
+                console.print("[cyan]Getting an access token via OAuth flow...[/cyan]")
                 access_token = self.get_salesforce_access_token(credentials, force_refresh=True)
             else:
                 access_token = credentials.get('access_token')
@@ -476,7 +948,10 @@ class SalesforceQueryTool:
             # Handle 'shape' query type separately (uses describe API, not SOQL)
             if query_type.lower() == 'shape':
                 with console.status(f"[bold green]Describing {sobject}..."):
-                    fields = self.describe_sobject(instance_url, access_token, sobject)
+                    fields, access_token = self._call_with_reauth(
+                        credentials, access_token,
+                        lambda token: self.describe_sobject(instance_url, token, sobject, user)
+                    )
 
                 # Display in terminal
                 table = Table(title=f"{sobject} - Object Shape ({len(fields)} fields)", show_lines=True)
@@ -500,6 +975,7 @@ class SalesforceQueryTool:
                 return
 
             # Build SOQL query
+            use_bulk = False
             if custom_query:
                 soql_query = custom_query
             elif query_type.lower() == "count":
@@ -508,10 +984,40 @@ class SalesforceQueryTool:
                 soql_query = f"SELECT Id, Name FROM {sobject} LIMIT 20"
             elif query_type.lower() == "all":
                 limit = CONFIG.get('all_query_limit') or 10
-                soql_query = f"SELECT FIELDS(ALL) FROM {sobject} LIMIT {limit}"
+                # Explicit projection from describe instead of FIELDS(ALL) (which caps at 200 rows),
+                # unless the field list is too long for a GET query string
+                with console.status(f"[bold green]Describing {sobject}..."):
+                    fields, access_token = self._call_with_reauth(
+                        credentials, access_token,
+                        lambda token: self.describe_sobject(instance_url, token, sobject, user)
+                    )
+                skip_calculated = CONFIG.get('all_exclude_calculated_fields', False)
+                names = [
+                    f['name'] for f in fields
+                    if f['type'] not in SKIP_FIELD_TYPES and not f['deprecatedAndHidden']
+                    and not (skip_calculated and f['calculated'])
+                ]
+                soql_query, use_bulk = _all_fields_query(instance_url, sobject, names, limit,
+                                                         CONFIG.get('all_bulk_threshold'))
             else:
                 soql_query = f"SELECT Id FROM {sobject} LIMIT 10"
 
+            # Large 'all' exports run as a Bulk API 2.0 job, streamed straight to Excel
+            if use_bulk:
+                console.print("[cyan]Running as a Bulk API 2.0 query job and saving results to Excel...[/cyan]")
+                records, access_token = self._call_with_reauth(
+                    credentials, access_token,
+                    lambda token: self.bulk_query_records(instance_url, token, soql_query,
+                                                          CONFIG.get('all_bulk_max_wait') or 1800)
+                )
+                filepath, count = self.save_to_excel(records, soql_query, save_directory, sobject)
+                if filepath:
+                    console.print(f"\n[bold green]✓ Results saved successfully![/bold green]")
+                    console.print(f"[cyan]File location:[/cyan] {filepath}")
+                    console.print(f"[cyan]Total records:[/cyan] {count}")
+                    console.print(f"[cyan]Total columns:[/cyan] {len(names)}\n")
+                return
+
             # Execute query (with retry on auth failure if auto_refresh is enabled)
             try:
                 results = self.query_salesforce(instance_url, access_token, soql_query)
@@ -525,7 +1031,8 @@ class SalesforceQueryTool:
 
                         # Always attempt OAuth flow to get a fresh token (don't trust stored access_token)
                         console.print("[cyan]Generating new access token using OAuth flow...[/cyan]")
-                        access_token = self.get_salesforce_access_token(credentials, force_refresh=True)
+                        access_token = self.get_salesforce_access_token(credentials, force_refresh=True,
+                                                                        use_cache=False)
 
                         # Update instance_url in case it changed
                         instance_url = credentials.get('instance_url')
@@ -551,19 +1058,16 @@ class SalesforceQueryTool:
             if query_type.lower() == 'all':
                 # Save to Excel for 'all' query type
                 console.print("[cyan]Saving results to Excel...[/cyan]")
-                filepath = self.save_to_excel(results, soql_query, save_directory, sobject)
+                records = self.iter_records(instance_url, access_token, results)
+                filepath, count = self.save_to_excel(records, soql_query, save_directory, sobject)
                 if filepath:
                     console.print(f"\n[bold green]✓ Results saved successfully![/bold green]")
                     console.print(f"[cyan]File location:[/cyan] {filepath}")
-                    console.print(f"[cyan]Total records:[/cyan] {results.get('totalSize', 0)}")
+                    console.print(f"[cyan]Total records:[/cyan] {count}")
 
                     # Count columns
-                    records = results.get('records', [])
-                    if records:
-                        all_fields = set()
-                        for record in records:
-                            all_fields.update(k for k in record.keys() if k != 'attributes')
-                        console.print(f"[cyan]Total columns:[/cyan] {len(all_fields)}\n")
+                    first = results['records'][0]
+                    console.print(f"[cyan]Total columns:[/cyan] {sum(1 for k in first if k != 'attributes')}\n")
             else:
                 # Display in terminal for other query types
                 self.display_results(results, soql_query)
@@ -572,7 +1076,8 @@ class SalesforceQueryTool:
             console.print(f"[bold red]Error: {str(e)}[/bold red]")
             raise
 
-    def run_search_objects(self, secret_path: str, search_filter: str = None, always_use_oauth: bool = False):
+    def run_search_objects(self, secret_path: str, search_filter: str = None, always_use_oauth: bool = False,
+                           rate_per_minute: int = 600, skip_system_objects: bool = False):
         """Search Salesforce objects and display with record counts"""
         try:
             # Fetch credentials
@@ -583,6 +1088,8 @@ class SalesforceQueryTool:
             instance_url = credentials.get('instance_url')
             if not instance_url:
                 raise ValueError("instance_url not found in credentials")
+            # Metadata caches are per secret and user: what describe returns depends on their permissions
+            user = f"{secret_path}:{_credentials_user(credentials)}"
 
             # Get access token
             if always_use_oauth:
@@ -595,14 +1102,16 @@ class SalesforceQueryTool:
                     access_token = self.get_salesforce_access_token(credentials)
 
             # Get all objects
-            all_objects = self.get_salesforce_objects(instance_url, access_token)
+            all_objects, access_token = self._call_with_reauth(
+                credentials, access_token, lambda token: self.get_salesforce_objects(instance_url, token, user)
+            )
 
             # Filter objects if search term provided
             if search_filter:
-                search_term = search_filter.lower()
+                matches = _filter_matcher(search_filter)
                 filtered_objects = [
                     obj for obj in all_objects
-                    if search_term in obj['name'].lower() or search_term in obj.get('label', '').lower()
+                    if matches(obj['name']) or matches(obj.get('label', ''))
                 ]
                 console.print(f"\n[cyan]Found {len(filtered_objects)} object(s) matching '{search_filter}'[/cyan]\n")
             else:
@@ -620,24 +1129,47 @@ class SalesforceQueryTool:
             table.add_column("Record Count", style="yellow", justify="right")
             table.add_column("Queryable", style="blue", justify="center")
 
-            # Get counts for each object (with progress indicator)
-            with console.status("[bold green]Counting records...") as status:
-                for idx, obj in enumerate(filtered_objects, 1):
-                    obj_name = obj['name']
-                    obj_label = obj.get('label', '')
-                    is_queryable = obj.get('queryable', False)
-
-                    status.update(f"[bold green]Counting records... ({idx}/{len(filtered_objects)}) {obj_name}")
-
-                    # Only count if queryable
-                    if is_queryable:
-                        count = self.count_records(instance_url, access_token, obj_name)
-                        count_str = str(count) if count >= 0 else "Error"
-                    else:
-                        count_str = "N/A"
+            # Count queryable objects in composite batches, several batches at a time
+            queryable = [obj['name'] for obj in filtered_objects if obj.get('queryable', False)]
+            skipped = set()
+            if skip_system_objects:
+                object_names = {obj['name'] for obj in all_objects}
+                skipped = {
+                    obj['name'] for obj in filtered_objects
+                    if _is_system_object(obj['name'], object_names) or obj.get('deprecatedAndHidden', False)
+                }
+                queryable = [name for name in queryable if name not in skipped]
+            counts = {}
+            if queryable:
+                limiter = RateLimiter(rate_per_minute)
+                batches = [queryable[i:i + COUNT_BATCH_SIZE] for i in range(0, len(queryable), COUNT_BATCH_SIZE)]
+
+                def count_batch(names: List[str]) -> Dict[str, int]:
+                    limiter.acquire()
+                    return self.count_records_batch(instance_url, access_token, names)
+
+                with console.status("[bold green]Counting records...") as status:
+                    with ThreadPoolExecutor(max_workers=min(COUNT_WORKERS, len(batches))) as executor:
+                        futures = [executor.submit(count_batch, names) for names in batches]
+                        for future in as_completed(futures):
+                            counts.update(future.result())
+                            status.update(f"[bold green]Counting records... ({len(counts)}/{len(queryable)})")
+
+            for obj in filtered_objects:
+                obj_name = obj['name']
+                is_queryable = obj.get('queryable', False)
+
+                # Only queryable objects were counted
+                if obj_name in skipped:
+                    count_str = "Skipped"
+                elif is_queryable:
+                    count = counts[obj_name]
+                    count_str = str(count) if count >= 0 else "Error"
+                else:
+                    count_str = "N/A"
 
-                    queryable_str = "✓" if is_queryable else "✗"
-                    table.add_row(obj_name, obj_label, count_str, queryable_str)
+                queryable_str = "✓" if is_queryable else "✗"
+                table.add_row(obj_name, obj.get('label', ''), count_str, queryable_str)
 
             console.print(table)
             console.print(f"\n[green]Displayed {len(filtered_objects)} object(s)[/green]\n")
@@ -647,52 +1179,76 @@ class SalesforceQueryTool:
             raise
 
 
+def _as_list(value: Union[str, List[str]]) -> List[str]:
+    """Normalise a single secret path or a list of them to a list"""
+    return [value] if isinstance(value, str) else list(value)
+
+
 def main():
     """Main entry point"""
     console.print("\n[bold blue]═══════════════════════════════════════════════════════[/bold blue]")
     console.print("[bold blue]       Salesforce Query Tool via AWS Secrets          [/bold blue]")
     console.print("[bold blue]═══════════════════════════════════════════════════════[/bold blue]\n")
 
+    # Validate the save directory up front -- 'all' and 'shape' export to Excel
+    save_directory = CONFIG.get('save_directory')
+    if save_directory and not os.path.isdir(save_directory):
+        console.print(f"[red]Error: Directory does not exist: {save_directory}[/red]")
+        console.print("[yellow]Please set 'save_directory' in the CONFIG section at the top of this file[/yellow]")
+        return
+
     # Create tool instance
     tool = SalesforceQueryTool(
         profile=CONFIG['aws_profile'],
         region=CONFIG['aws_region']
     )
 
-    # Check if we're in search objects mode
-    if CONFIG['search_objects_mode']:
-        if not CONFIG['secret_path']:
-            console.print("[red]Error: 'secret_path' is not set in CONFIG[/red]")
-            console.print("[yellow]Please edit the CONFIG section at the top of this file[/yellow]")
-            return
-
-        tool.run_search_objects(
-            secret_path=CONFIG['secret_path'],
-            search_filter=CONFIG['search_objects_filter'],
-            always_use_oauth=CONFIG['always_use_oauth']
-        )
-        return
+    try:
+        _run(tool)
+    finally:
+        tool.close()
 
-    # Validate configuration
+
+def _run(tool: SalesforceQueryTool):
     if not CONFIG['secret_path']:
         console.print("[red]Error: 'secret_path' is not set in CONFIG[/red]")
         console.print("[yellow]Please edit the CONFIG section at the top of this file[/yellow]")
         return
 
+    secret_paths = _as_list(CONFIG['secret_path'])
+    if len(secret_paths) > 1:
+        with console.status("[bold green]Fetching credentials from AWS..."):
+            tool.get_secrets(secret_paths)
+
+    # Check if we're in search objects mode
+    if CONFIG['search_objects_mode']:
+        for secret_path in secret_paths:
+            tool.run_search_objects(
+                secret_path=secret_path,
+                search_filter=CONFIG['search_objects_filter'],
+                always_use_oauth=CONFIG['always_use_oauth'],
+                rate_per_minute=CONFIG['discover_rate_per_minute'],
+                skip_system_objects=CONFIG['discover_skip_system_objects']
+            )
+        return
+
+    # Validate configuration
     if not CONFIG['sobject']:
         console.print("[red]Error: 'sobject' is not set in CONFIG[/red]")
         console.print("[yellow]Please edit the CONFIG section at the top of this file[/yellow]")
         return
 
     # Run the query
-    tool.run_query(
-        secret_path=CONFIG['secret_path'],
-        sobject=CONFIG['sobject'],
-        query_type=CONFIG['query_type'],
-        custom_query=CONFIG['custom_query'],
-        auto_refresh=CONFIG['auto_refresh_on_expire'],
-        always_use_oauth=CONFIG['always_use_oauth']
-    )
+    for secret_path in secret_paths:
+        tool.run_query(
+            secret_path=secret_path,
+            sobject=CONFIG['sobject'],
+            query_type=CONFIG['query_type'],
+            custom_query=CONFIG['custom_query'],
+            auto_refresh=CONFIG['auto_refresh_on_expire'],
+            always_use_oauth=CONFIG['always_use_oauth'],
+            save_directory=CONFIG.get('save_directory')
+        )
 
 
 if __name__ == "__main__":
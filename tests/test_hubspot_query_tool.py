@@ -0,0 +1,15 @@
+import hubspot_query_tool
+from hubspot_query_tool import HubSpotQueryTool
+
+
+def test_token_cache_is_per_portal(tmp_path, monkeypatch):
+    """Two installs of the same public app must not share a cached access token"""
+    monkeypatch.setattr(hubspot_query_tool, 'CACHE_DIR', str(tmp_path))
+    tool = HubSpotQueryTool.__new__(HubSpotQueryTool)
+    portal_a = {'client_id': 'app', 'client_secret': 's', 'refresh_token': 'refresh-a'}
+    portal_b = {'client_id': 'app', 'client_secret': 's', 'refresh_token': 'refresh-b'}
+
+    tool._save_cached_token(hubspot_query_tool._token_cache_key(portal_a), 'token-a', 1800)
+
+    assert tool._load_cached_token(hubspot_query_tool._token_cache_key(portal_a)) == 'token-a'
+    assert tool._load_cached_token(hubspot_query_tool._token_cache_key(portal_b)) is None
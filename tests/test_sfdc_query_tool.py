@@ -0,0 +1,49 @@
+import sfdc_query_tool
+from sfdc_query_tool import SF_MAX_URI_LENGTH, SalesforceQueryTool, _all_fields_query
+
+INSTANCE_URL = 'https://example.my.salesforce.com/'
+
+
+def _wide_object_fields(count: int = 800):
+    """Synthetic managed-package field names, long enough to overflow a GET query string"""
+    return [f'Apttus_Config2__SyntheticField{i:04d}__c' for i in range(count)]
+
+
+def test_all_query_uses_explicit_fields_when_short():
+    soql, use_bulk = _all_fields_query(INSTANCE_URL, 'Account', ['Id', 'Name'], 50, 10000)
+    assert soql == 'SELECT Id, Name FROM Account LIMIT 50'
+    assert not use_bulk
+
+
+def test_all_query_falls_back_to_fields_all_when_uri_too_long():
+    names = _wide_object_fields()
+    assert len(', '.join(names)) > SF_MAX_URI_LENGTH
+
+    soql, use_bulk = _all_fields_query(INSTANCE_URL, 'Apttus_Config2__AssetLineItem__c', names, 50, 10000)
+
+    assert soql == 'SELECT FIELDS(ALL) FROM Apttus_Config2__AssetLineItem__c LIMIT 50'
+    assert not use_bulk
+
+
+def test_all_query_runs_as_bulk_when_uri_too_long_and_over_200_rows():
+    names = _wide_object_fields()
+
+    soql, use_bulk = _all_fields_query(INSTANCE_URL, 'Apttus_Config2__AssetLineItem__c', names, 500, 10000)
+
+    assert soql.startswith(f'SELECT {names[0]}, ')
+    assert use_bulk
+
+
+def test_token_cache_is_per_user(tmp_path, monkeypatch):
+    """Two integration users of the same connected app must not share a cached access token"""
+    monkeypatch.setattr(sfdc_query_tool, 'CACHE_DIR', str(tmp_path))
+    tool = SalesforceQueryTool.__new__(SalesforceQueryTool)
+    user_a = {'client_id': 'app', 'client_secret': 's', 'refresh_token': 'refresh-a', 'instance_url': INSTANCE_URL}
+    user_b = {'client_id': 'app', 'client_secret': 's', 'refresh_token': 'refresh-b', 'instance_url': INSTANCE_URL}
+    monkeypatch.setattr(tool, '_request_access_token', lambda credentials, token_url: 'token-a')
+
+    assert tool.get_salesforce_access_token(user_a, force_refresh=True) == 'token-a'
+
+    monkeypatch.setattr(tool, '_request_access_token', lambda credentials, token_url: 'token-b')
+    assert tool.get_salesforce_access_token(user_b, force_refresh=True) == 'token-b'
+    assert tool.get_salesforce_access_token(user_a, force_refresh=True) == 'token-a'